@@ -0,0 +1,158 @@
+"""Benchmark FAT16 operations on synthetic images and compare them with a saved baseline
+
+    python benchmarks/run.py                              # run and print
+    python benchmarks/run.py --save benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+
+Call counts (read and write calls, seeks) are deterministic and compared
+exactly. Median latencies are compared with a tolerance and only mean
+something against a baseline saved on the same machine.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fat16lib import FAT16
+from fat16lib.mkfs import build_image
+
+MB = 1024 * 1024
+
+# name: (image size, cluster size, root entries, files, file size range, fragmentation)
+SCENARIOS = {
+    'small': (16 * MB, 2048, 512, 64, (512, 64 * 1024), 0.0),
+    'medium': (128 * MB, 4096, 1024, 512, (4096, 256 * 1024), 0.1),
+    'large': (512 * MB, 8192, 4096, 2048, (4096, 256 * 1024), 0.3),
+}
+
+COUNTERS = ('read_calls', 'write_calls', 'seeks', 'bytes_read', 'bytes_written')
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def measure(fat, calls, payload_bytes=0):
+    """Time each call and count the I/O it caused, returning per-call figures"""
+    before = fat.stats.snapshot()
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    after = fat.stats.snapshot()
+
+    total = sum(samples)
+    result = {
+        'calls': len(samples),
+        'mean_ms': total / len(samples) * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'ops_per_s': len(samples) / total if total else 0.0,
+    }
+    if payload_bytes:
+        result['mb_per_s'] = payload_bytes / MB / total if total else 0.0
+    for name in COUNTERS:
+        result[name] = (after[name] - before[name]) / len(samples)
+    return result
+
+def run_scenario(workdir, name, repeat, mounted):
+    size, cluster_size, root_entries, file_count, file_size, fragmentation = SCENARIOS[name]
+    image_path = os.path.join(workdir, f'{name}.img')
+    build_image(image_path, size, file_count=file_count, file_size=file_size, fragmentation=fragmentation,
+                seed=1, cluster_size=cluster_size, root_entries=root_entries)
+
+    fat = FAT16.open(image_path, writable=True) if mounted else FAT16(image_path)
+    fat.enable_stats()
+    rng = random.Random(1)
+    files = dict(fat.list_files())
+    picks = [rng.choice(sorted(files)) for _ in range(repeat)]
+
+    sources = []
+    for index in range(repeat):
+        source = os.path.join(workdir, f'INS{index:05d}.BIN')
+        with open(source, 'wb') as out:
+            out.write(bytes(rng.randint(file_size[0], file_size[1])))
+        sources.append(source)
+    inserted = sum(os.path.getsize(source) for source in sources)
+
+    results = {
+        'list_files': measure(fat, [fat.list_files] * repeat),
+        'get_file_attributes': measure(fat, [lambda name=name: fat.get_file_attributes(name) for name in picks]),
+        'read_file': measure(fat, [lambda name=name: fat.read_file(name) for name in picks],
+                             sum(files[name] for name in picks)),
+        'insert_external_file': measure(fat, [lambda source=source: fat.insert_external_file(source) for source in sources],
+                                        inserted),
+        'delete_file': measure(fat, [lambda source=source: fat.delete_file(os.path.basename(source)) for source in sources]),
+    }
+    fat.close()
+    os.remove(image_path)
+    for source in sources:
+        os.remove(source)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Return a line for every figure that got worse than the baseline"""
+    regressions = []
+    for scenario, operations in results.items():
+        for operation, figures in operations.items():
+            reference = baseline.get(scenario, {}).get(operation)
+            if reference is None:
+                continue
+            for name in ('read_calls', 'write_calls', 'seeks'):
+                if figures[name] > reference[name] + 1e-9:
+                    regressions.append(f"{scenario}/{operation}: {name} {reference[name]:.1f} -> {figures[name]:.1f}")
+            # the median shrugs off the odd slow call that would swing the mean
+            if figures['p50_ms'] > reference['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{scenario}/{operation}: p50 {reference['p50_ms']:.3f}ms -> {figures['p50_ms']:.3f}ms")
+    return regressions
+
+def print_results(results):
+    header = f"{'scenario':14} {'operation':22} {'mean ms':>9} {'p95 ms':>9} {'ops/s':>9} {'MB/s':>8} {'reads':>7} {'writes':>7} {'seeks':>7}"
+    print(header)
+    print('-' * len(header))
+    for scenario, operations in results.items():
+        for operation, figures in operations.items():
+            throughput = f"{figures['mb_per_s']:.1f}" if 'mb_per_s' in figures else '-'
+            print(f"{scenario:14} {operation:22} {figures['mean_ms']:9.3f} {figures['p95_ms']:9.3f} "
+                  f"{figures['ops_per_s']:9.0f} {throughput:>8} {figures['read_calls']:7.1f} "
+                  f"{figures['write_calls']:7.1f} {figures['seeks']:7.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=50, help="calls per operation")
+    parser.add_argument('--mounted', action='store_true', help="keep one mount open instead of remounting per call")
+    parser.add_argument('--save', metavar='PATH', help="write the results as a new baseline")
+    parser.add_argument('--baseline', metavar='PATH', help="compare the results with a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed relative latency increase")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        suffix = '-mounted' if args.mounted else ''
+        results = {name + suffix: run_scenario(workdir, name, args.repeat, args.mounted) for name in args.scenarios}
+    print_results(results)
+
+    if args.save:
+        saved = {}
+        if os.path.exists(args.save):
+            with open(args.save) as source:
+                saved = json.load(source)
+        saved.update(results)
+        with open(args.save, 'w') as out:
+            json.dump(saved, out, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as source:
+            regressions = compare(results, json.load(source), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,13 @@
 from .fat16 import FAT16
+from .geometry import Geometry
+from .directory import DirEntry
+from .check import CheckReport
+from .defrag import DefragReport
+from .stats import IOStats
+from .mkfs import format_image, build_image
+from .batch import BatchResult, run_batch, JOB_LIST, JOB_EXTRACT_ALL, JOB_CHECK
+from .allocator import FIRST_FIT, NEXT_FIT, BEST_FIT
+from .constants import ZERO_NEVER, ZERO_IMMEDIATE, ZERO_DEFERRED
 from .exceptions import FAT16Error, FileNotFoundError, NotEnoughSpaceError, InvalidFileNameError, InvalidDiskImageError, FileAccessError
 
-__all__ = ['FAT16', 'FAT16Error', 'FileNotFoundError', 'NotEnoughSpaceError', 'InvalidFileNameError', 'InvalidDiskImageError', 'FileAccessError']
\ No newline at end of file
+__all__ = ['FAT16', 'Geometry', 'DirEntry', 'CheckReport', 'DefragReport', 'IOStats', 'format_image', 'build_image', 'BatchResult', 'run_batch', 'JOB_LIST', 'JOB_EXTRACT_ALL', 'JOB_CHECK', 'FIRST_FIT', 'NEXT_FIT', 'BEST_FIT', 'ZERO_NEVER', 'ZERO_IMMEDIATE', 'ZERO_DEFERRED', 'FAT16Error', 'FileNotFoundError', 'NotEnoughSpaceError', 'InvalidFileNameError', 'InvalidDiskImageError', 'FileAccessError']
\ No newline at end of file
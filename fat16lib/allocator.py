@@ -0,0 +1,125 @@
+from .constants import *
+from .exceptions import *
+
+FIRST_FIT = 'first-fit'
+NEXT_FIT = 'next-fit'
+BEST_FIT = 'best-fit'
+
+ALLOCATION_POLICIES = (FIRST_FIT, NEXT_FIT, BEST_FIT)
+
+_FREE = b'\x01'
+_USED = b'\x00'
+
+class ClusterAllocator:
+    """Free-cluster bitmap built once from the FAT, with pluggable placement policies"""
+
+    def __init__(self, fat, total_clusters, policy=FIRST_FIT):
+        """Mark every free data cluster of the FAT in a byte-per-cluster bitmap"""
+        if policy not in ALLOCATION_POLICIES:
+            raise ValueError(f"Unknown allocation policy: {policy}")
+        self.policy = policy
+        self._limit = FIRST_DATA_CLUSTER + total_clusters
+        self._bitmap = bytearray(self._limit)
+        for cluster in range(FIRST_DATA_CLUSTER, self._limit):
+            if fat[cluster] == CLUSTER_FREE:
+                self._bitmap[cluster] = 1
+        self.free_count = self._bitmap.count(_FREE)
+        self._cursor = FIRST_DATA_CLUSTER
+
+    def is_free(self, cluster):
+        return FIRST_DATA_CLUSTER <= cluster < self._limit and self._bitmap[cluster] == 1
+
+    def has_space(self, count):
+        """Check whether count clusters can be allocated"""
+        return count <= self.free_count
+
+    def _runs(self, start=FIRST_DATA_CLUSTER, stop=None):
+        """Yield (start, count) runs of free clusters between start and stop"""
+        bitmap = self._bitmap
+        stop = self._limit if stop is None else stop
+        position = start
+        while position < stop:
+            run_start = bitmap.find(_FREE, position, stop)
+            if run_start < 0:
+                return
+            run_end = bitmap.find(_USED, run_start, stop)
+            if run_end < 0:
+                run_end = stop
+            yield run_start, run_end - run_start
+            position = run_end
+
+    def free_extents(self):
+        """Return every run of free clusters as (start, count) pairs"""
+        return list(self._runs())
+
+    def largest_free_extent(self):
+        """Return the longest run of free clusters, or None when the volume is full"""
+        return max(self._runs(), key=lambda run: run[1], default=None)
+
+    def _take(self, runs, count):
+        clusters = []
+        for run_start, run_count in runs:
+            take = min(run_count, count - len(clusters))
+            clusters.extend(range(run_start, run_start + take))
+            if len(clusters) == count:
+                break
+        return clusters
+
+    def _next_fit_runs(self):
+        yield from self._runs(self._cursor)
+        yield from self._runs(FIRST_DATA_CLUSTER, self._cursor)
+
+    def _best_fit_runs(self, count):
+        """Smallest run that holds everything, otherwise the largest runs first"""
+        runs = self.free_extents()
+        fitting = [run for run in runs if run[1] >= count]
+        if fitting:
+            return [min(fitting, key=lambda run: run[1])]
+        return sorted(runs, key=lambda run: run[1], reverse=True)
+
+    def allocate(self, count, policy=None):
+        """Reserve count free clusters and return them in chain order"""
+        if count <= 0:
+            return []
+        if not self.has_space(count):
+            raise NotEnoughSpaceError("There are not enough free clusters")
+
+        policy = policy or self.policy
+        if policy == FIRST_FIT:
+            clusters = self._take(self._runs(), count)
+        elif policy == NEXT_FIT:
+            clusters = self._take(self._next_fit_runs(), count)
+        elif policy == BEST_FIT:
+            clusters = self._take(self._best_fit_runs(count), count)
+        else:
+            raise ValueError(f"Unknown allocation policy: {policy}")
+
+        self.reserve(clusters)
+        self._cursor = clusters[-1] + 1 if clusters[-1] + 1 < self._limit else FIRST_DATA_CLUSTER
+        return clusters
+
+    def allocate_extent(self, count):
+        """Reserve a single contiguous run of count clusters, or return None"""
+        fitting = [run for run in self._runs() if run[1] >= count]
+        if count <= 0 or not fitting:
+            return None
+        start = min(fitting, key=lambda run: run[1])[0]
+        clusters = list(range(start, start + count))
+        self.reserve(clusters)
+        return clusters
+
+    def reserve(self, clusters):
+        """Mark clusters as used"""
+        bitmap = self._bitmap
+        for cluster in clusters:
+            if bitmap[cluster]:
+                bitmap[cluster] = 0
+                self.free_count -= 1
+
+    def release(self, clusters):
+        """Return clusters to the free pool"""
+        bitmap = self._bitmap
+        for cluster in clusters:
+            if FIRST_DATA_CLUSTER <= cluster < self._limit and not bitmap[cluster]:
+                bitmap[cluster] = 1
+                self.free_count += 1
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import shutil
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .exceptions import *
+from .fat16 import FAT16
+
+JOB_LIST = 'list'
+JOB_EXTRACT_ALL = 'extract_all'
+JOB_CHECK = 'check'
+BATCH_JOBS = (JOB_LIST, JOB_EXTRACT_ALL, JOB_CHECK)
+
+class BatchResult(namedtuple('BatchResult', ['image_path', 'job', 'value', 'error'])):
+    """Outcome of running one job against one disk image"""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+def _iter_files(fat):
+    """Yield (path, size) for every file in the image, walking subdirectories"""
+    for dirpath, dirnames, filenames in fat.walk():
+        sizes = dict(fat.list_dir(dirpath))
+        for name in filenames:
+            yield (f"{dirpath}/{name}" if dirpath else name), sizes[name]
+
+def _extract_path(target_dir, path):
+    """Map an image path onto the host below target_dir, refusing names that escape it"""
+    parts = path.split('/')
+    if any(part in ('', '.', '..') or os.sep in part or (os.altsep and os.altsep in part) for part in parts):
+        raise InvalidFileNameError(f"Refusing to extract unsafe name '{path}'")
+    return os.path.join(target_dir, *parts)
+
+def _extract_dir(output_dir, image_path):
+    """Per-image directory under output_dir, tagged with a hash of the image's absolute path"""
+    # images in different folders often share a basename, and they must not extract over each other
+    tag = hashlib.sha1(os.fsencode(os.path.abspath(image_path))).hexdigest()[:8]
+    return os.path.join(output_dir, f"{os.path.basename(image_path)}-{tag}")
+
+def _extract_all(fat, image_path, output_dir):
+    """Copy every file out of the image, to disk when output_dir is given or into memory otherwise"""
+    if output_dir is None:
+        contents = {}
+        for path, size in _iter_files(fat):
+            with fat.open_file(path) as reader:
+                contents[path] = reader.readall()
+        return contents
+
+    target_dir = _extract_dir(output_dir, image_path)
+    extracted = []
+    for path, size in _iter_files(fat):
+        host_path = _extract_path(target_dir, path)
+        os.makedirs(os.path.dirname(host_path), exist_ok=True)
+        with fat.open_file(path) as reader, open(host_path, 'wb') as out:
+            shutil.copyfileobj(reader, out)
+        extracted.append((path, size))
+    return extracted
+
+def run_job(image_path, job, output_dir=None):
+    """Run one job against one image, capturing any error in the result"""
+    try:
+        with FAT16.open(image_path, use_mmap=True) as fat:
+            if job == JOB_LIST:
+                value = list(_iter_files(fat))
+            elif job == JOB_EXTRACT_ALL:
+                value = _extract_all(fat, image_path, output_dir)
+            else:
+                value = fat.check()
+        return BatchResult(image_path, job, value, None)
+    except (FAT16Error, OSError, ValueError) as e:
+        return BatchResult(image_path, job, None, e)
+
+def run_batch(image_paths, job, output_dir=None, max_workers=None, max_in_flight=None):
+    """Run a job over many images on a process pool, yielding results as they complete
+
+    At most max_in_flight images (twice the worker count by default) are
+    submitted at a time, so image_paths may be a lazy iterator of any length.
+    A failure in one image is reported in its BatchResult and does not stop
+    the batch.
+    """
+    if job not in BATCH_JOBS:
+        raise ValueError(f"Unknown batch job: {job}")
+
+    workers = max_workers or os.cpu_count() or 1
+    window = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for image_path in image_paths:
+            pending[executor.submit(run_job, image_path, job, output_dir)] = image_path
+            if len(pending) >= window:
+                yield from _collect(pending, job)
+        while pending:
+            yield from _collect(pending, job)
+
+def _collect(pending, job):
+    """Wait for at least one in-flight job and yield the results that are ready"""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        image_path = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:
+            # a worker that died takes only its own image down with it
+            result = BatchResult(image_path, job, None, e)
+        yield result
@@ -0,0 +1,76 @@
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size', 'budget'])
+
+class BlockCache:
+    """LRU cache of cluster-sized blocks of the data region, bounded by a byte budget"""
+
+    def __init__(self, budget, base, block_size):
+        """Cache blocks of block_size bytes counted from image offset base"""
+        self.budget = budget
+        self.base = base
+        self.block_size = block_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, self.size, self.budget)
+
+    def covers(self, offset, size):
+        """Check whether a read should go through the cache at all"""
+        return offset >= self.base and 0 < size <= self.budget // 4
+
+    def block_of(self, offset):
+        return (offset - self.base) // self.block_size
+
+    def block_offset(self, block):
+        return self.base + block * self.block_size
+
+    def get(self, block):
+        """Return a cached block and mark it most recently used, or None"""
+        data = self._blocks.get(block)
+        if data is None:
+            self.misses += 1
+            return None
+        self._blocks.move_to_end(block)
+        self.hits += 1
+        return data
+
+    def put(self, block, data):
+        """Store a block, evicting least recently used blocks over budget"""
+        if len(data) > self.budget:
+            return
+        previous = self._blocks.pop(block, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._blocks[block] = data
+        self.size += len(data)
+        while self.size > self.budget:
+            _, evicted = self._blocks.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def invalidate(self, offset, size):
+        """Drop every cached block overlapping [offset, offset + size)"""
+        if not self._blocks or offset + size <= self.base:
+            return
+        first = self.block_of(max(offset, self.base))
+        last = self.block_of(offset + size - 1)
+        if last - first + 1 > len(self._blocks):
+            blocks = [block for block in self._blocks if first <= block <= last]
+        else:
+            blocks = range(first, last + 1)
+        for block in blocks:
+            data = self._blocks.pop(block, None)
+            if data is not None:
+                self.size -= len(data)
+
+    def clear(self):
+        self._blocks.clear()
+        self.size = 0
@@ -0,0 +1,107 @@
+from array import array
+from collections import namedtuple
+from .constants import *
+
+_REPORT_FIELDS = [
+    'files_checked',
+    'clusters_in_use',
+    'lost_clusters',
+    'cross_linked',
+    'loops',
+    'broken_chains',
+    'size_mismatches',
+    'fat_mismatches',
+    'repaired',
+]
+
+class CheckReport(namedtuple('CheckReport', _REPORT_FIELDS)):
+    """Result of a consistency scan over the FAT and the directory tree"""
+    __slots__ = ()
+
+    @property
+    def clean(self):
+        return not (self.lost_clusters or self.cross_linked or self.loops or self.broken_chains
+                    or self.size_mismatches or self.fat_mismatches)
+
+def count_fat_differences(reference, copy):
+    """Count FAT entries that differ between two raw FAT copies"""
+    if reference == copy:
+        return 0
+    first = array('H', reference[:len(reference) - len(reference) % FAT_ENTRY_SIZE])
+    second = array('H', copy[:len(copy) - len(copy) % FAT_ENTRY_SIZE])
+    return sum(1 for a, b in zip(first, second) if a != b) + abs(len(first) - len(second))
+
+def scan_volume(entries, total_clusters, cluster_size, files, fat_copies):
+    """Follow every chain once and report lost, cross-linked, looping, broken and mis-sized chains
+
+    entries is the FAT as an array of 16-bit values, files an iterable of
+    (path, first_cluster, size, is_directory) tuples, and fat_copies the raw
+    bytes of each FAT copy with copy 0 first. Returns the report and, for every
+    file, the prefix of its chain that it owns exclusively.
+    """
+    limit = min(len(entries), FIRST_DATA_CLUSTER + total_clusters)
+    owner = array('l', [-1]) * limit
+    paths = []
+    kept_chains = {}
+    cross_linked = []
+    loops = []
+    broken_chains = []
+    size_mismatches = []
+
+    for index, (path, first_cluster, size, is_directory) in enumerate(files):
+        paths.append(path)
+        # a file only owns the clusters its size needs, so an overlong chain can't claim its neighbour's
+        needed = None if is_directory else (size + cluster_size - 1) // cluster_size
+        chain = []
+        truncated = False
+        cluster = first_cluster
+        while FIRST_DATA_CLUSTER <= cluster < limit:
+            if len(chain) == needed:
+                truncated = True
+                break
+            holder = owner[cluster]
+            if holder == index:
+                loops.append(path)
+                break
+            if holder >= 0:
+                cross_linked.append((cluster, paths[holder], path))
+                break
+            value = entries[cluster]
+            if value == CLUSTER_FREE or value == BAD_CLUSTER:
+                broken_chains.append((path, cluster))
+                break
+            owner[cluster] = index
+            chain.append(cluster)
+            if value >= END_OF_CHAIN_MIN:
+                break
+            cluster = value
+        else:
+            if cluster != first_cluster or (first_cluster != 0 and not chain):
+                broken_chains.append((path, cluster))
+
+        # count the clusters linked past the end of the file without claiming them
+        excess = 0
+        while truncated and FIRST_DATA_CLUSTER <= cluster < limit and excess < limit:
+            excess += 1
+            value = entries[cluster]
+            if value == CLUSTER_FREE or value == BAD_CLUSTER or value >= END_OF_CHAIN_MIN:
+                break
+            cluster = value
+
+        kept_chains[path] = chain
+        if not is_directory and (excess or len(chain) != needed):
+            size_mismatches.append((path, size, (len(chain) + excess) * cluster_size))
+
+    lost_clusters = [cluster for cluster in range(FIRST_DATA_CLUSTER, limit)
+                     if owner[cluster] < 0 and entries[cluster] != CLUSTER_FREE and entries[cluster] != BAD_CLUSTER]
+
+    fat_mismatches = []
+    for copy_index in range(1, len(fat_copies)):
+        differences = count_fat_differences(fat_copies[0], fat_copies[copy_index])
+        if differences:
+            fat_mismatches.append((copy_index, differences))
+
+    clusters_in_use = sum(len(chain) for chain in kept_chains.values())
+    report = CheckReport(len(paths), clusters_in_use, lost_clusters, cross_linked, loops,
+                         broken_chains, size_mismatches, fat_mismatches, False)
+    return report, kept_chains
@@ -4,9 +4,29 @@ SECTORS_PER_CLUSTER_OFFSET = 13
 RESERVED_SECTORS_OFFSET = 14
 NUMBER_OF_FATS_OFFSET = 16
 ROOT_DIR_ENTRIES_OFFSET = 17
+TOTAL_SECTORS_16_OFFSET = 19
 SECTORS_PER_FAT_OFFSET = 22
+TOTAL_SECTORS_32_OFFSET = 32
+MEDIA_DESCRIPTOR_OFFSET = 21
+SECTORS_PER_TRACK_OFFSET = 24
+NUMBER_OF_HEADS_OFFSET = 26
+EXTENDED_BOOT_SIGNATURE_OFFSET = 38
+VOLUME_LABEL_OFFSET = 43
+FILE_SYSTEM_TYPE_OFFSET = 54
+BOOT_SIGNATURE_OFFSET = 510
+
+BOOT_SECTOR_SIZE = 512
+BOOT_SIGNATURE = b'\x55\xAA'
+MEDIA_FIXED_DISK = 0xF8
+# FAT16 volumes have between MIN_CLUSTERS and MAX_CLUSTERS data clusters
+MIN_CLUSTERS = 4085
+MAX_CLUSTERS = 65524
+
+# Streaming writes are staged in cluster-aligned blocks of about this size
+WRITE_BLOCK_SIZE = 1024 * 1024
 
 DIR_ENTRY_SIZE = 32
+FAT_ENTRY_SIZE = 2
 FILE_NAME_SIZE = 8
 FILE_EXT_SIZE = 3
 
@@ -17,8 +37,21 @@ SYSTEM = 0x04
 VOLUME_LABEL = 0x08
 DIRECTORY = 0x10
 ARCHIVE = 0x20
+LONG_FILE_NAME = 0x0F
 
 # Special markers
 ENTRY_FREE = 0x00
 ENTRY_DELETED = 0xE5
-END_OF_CLUSTER = 0xFFFF
\ No newline at end of file
+END_OF_CLUSTER = 0xFFFF
+
+# FAT entry values
+CLUSTER_FREE = 0x0000
+FIRST_DATA_CLUSTER = 2
+BAD_CLUSTER = 0xFFF7
+END_OF_CHAIN_MIN = 0xFFF8
+
+# Zeroing policies for freed clusters
+ZERO_NEVER = 'never'
+ZERO_IMMEDIATE = 'immediate'
+ZERO_DEFERRED = 'deferred'
+ZERO_POLICIES = (ZERO_NEVER, ZERO_IMMEDIATE, ZERO_DEFERRED)
@@ -0,0 +1,25 @@
+from collections import namedtuple
+
+DefragReport = namedtuple('DefragReport', [
+    'fragmentation_before',
+    'fragmentation_after',
+    'files_moved',
+    'bytes_moved',
+    'files_skipped',
+    'complete',
+])
+
+def fragmentation_ratio(extent_lists):
+    """Share of cluster boundaries that are breaks, over a collection of per-file extent lists
+
+    0.0 means every file is contiguous, 1.0 means no two consecutive
+    clusters of any file are adjacent on disk.
+    """
+    breaks = 0
+    boundaries = 0
+    for extents in extent_lists:
+        clusters = sum(count for start, count in extents)
+        if clusters > 1:
+            breaks += len(extents) - 1
+            boundaries += clusters - 1
+    return breaks / boundaries if boundaries else 0.0
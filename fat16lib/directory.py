@@ -0,0 +1,269 @@
+import heapq
+import struct
+from bisect import bisect_right
+from .constants import *
+from .exceptions import *
+from .utils import *
+
+_NAME_FIELDS = struct.Struct(f'<{FILE_NAME_SIZE + FILE_EXT_SIZE}s{DIR_ENTRY_SIZE - FILE_NAME_SIZE - FILE_EXT_SIZE}x')
+_LISTING_FIELDS = struct.Struct(f'<{FILE_NAME_SIZE}s{FILE_EXT_SIZE}s17xI')
+
+class DirEntry:
+    """Lazily decoded view of one 32-byte directory entry inside a shared buffer"""
+    __slots__ = ('_data', '_offset', 'slot')
+
+    def __init__(self, data, slot, offset=None):
+        self._data = data
+        self.slot = slot
+        self._offset = slot * DIR_ENTRY_SIZE if offset is None else offset
+
+    def __repr__(self):
+        return f"DirEntry(name={self.name!r}, slot={self.slot}, first_cluster={self.first_cluster}, size={self.size})"
+
+    @property
+    def raw(self):
+        return bytes(self._data[self._offset:self._offset + DIR_ENTRY_SIZE])
+
+    @property
+    def name(self):
+        return format_entry_name(self._data[self._offset:self._offset + FILE_NAME_SIZE + FILE_EXT_SIZE])
+
+    @property
+    def attributes(self):
+        return self._data[self._offset + 11]
+
+    @property
+    def is_directory(self):
+        return bool(self.attributes & DIRECTORY)
+
+    @property
+    def time_created(self):
+        return decode_time(self._data[self._offset + 22:self._offset + 24])
+
+    @property
+    def date_created(self):
+        return decode_date(self._data[self._offset + 24:self._offset + 26])
+
+    @property
+    def first_cluster(self):
+        return struct.unpack_from('<H', self._data, self._offset + 26)[0]
+
+    @property
+    def size(self):
+        return struct.unpack_from('<I', self._data, self._offset + 28)[0]
+
+    def detach(self):
+        """Return a copy that no longer follows changes to the directory buffer"""
+        return DirEntry(self.raw, self.slot, 0)
+
+class DirectoryIndex:
+    """Hashed name index and free-slot list over one directory"""
+
+    def __init__(self, data, regions, first_cluster=0):
+        """Index raw directory bytes stored in the given (image offset, length) regions"""
+        self.first_cluster = first_cluster
+        self._data = bytearray(data)
+        self._slot_count = len(self._data) // DIR_ENTRY_SIZE
+        self._region_slots = []
+        self._region_offsets = []
+        slot = 0
+        for offset, length in regions:
+            self._region_slots.append(slot)
+            self._region_offsets.append(offset)
+            slot += length // DIR_ENTRY_SIZE
+        self._slots = {}
+        self._free_slots = []
+        self._dirty_slots = set()
+        self._build()
+
+    @classmethod
+    def load_root(cls, image, geometry):
+        """Read and index the root directory region in a single read"""
+        return cls(image.read(geometry.root_dir_start, geometry.root_dir_size),
+                   [(geometry.root_dir_start, geometry.root_dir_size)])
+
+    @classmethod
+    def load_chain(cls, image, geometry, extents, first_cluster):
+        """Read and index a subdirectory with one read per cluster extent"""
+        regions = []
+        chunks = []
+        for start_cluster, count in extents:
+            offset = geometry.cluster_offset(start_cluster)
+            length = count * geometry.cluster_size
+            regions.append((offset, length))
+            chunks.append(image.read(offset, length))
+        return cls(b''.join(chunks), regions, first_cluster)
+
+    @property
+    def is_root(self):
+        return self.first_cluster == 0
+
+    def _build(self):
+        """Index every used slot by its raw name field without decoding any entry"""
+        data = self._data
+        markers = data[0::DIR_ENTRY_SIZE]
+        attributes = data[11::DIR_ENTRY_SIZE]
+        names = [name for (name,) in _NAME_FIELDS.iter_unpack(data)]
+
+        end = markers.find(ENTRY_FREE)
+        if end < 0:
+            end = self._slot_count
+
+        slots = self._slots
+        free_slots = self._free_slots
+        for slot in range(end):
+            if markers[slot] == ENTRY_DELETED:
+                free_slots.append(slot)
+            elif attributes[slot] != LONG_FILE_NAME:
+                slots.setdefault(names[slot].upper(), slot)
+
+        free_slots.extend(range(end, self._slot_count))
+        heapq.heapify(free_slots)
+        self.scanned = end
+
+    def listing(self):
+        """Decode (name, size) for every indexed entry in slot order with one bulk unpack"""
+        rows = list(_LISTING_FIELDS.iter_unpack(self._data))
+        listing = []
+        for slot in sorted(self._slots.values()):
+            file_name, file_extension, file_size = rows[slot]
+            listing.append((join_entry_name(file_name, file_extension), file_size))
+        return listing
+
+    def _key(self, name):
+        return entry_key(name)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, name):
+        return self._key(name) in self._slots
+
+    def __iter__(self):
+        """Iterate over live entry views in on-disk slot order"""
+        data = self._data
+        return (DirEntry(data, slot) for slot in sorted(self._slots.values()))
+
+    @property
+    def free_slot_count(self):
+        return len(self._free_slots)
+
+    @property
+    def dirty(self):
+        return bool(self._dirty_slots)
+
+    def entry(self, slot):
+        """Return the raw 32-byte entry stored in a slot"""
+        offset = slot * DIR_ENTRY_SIZE
+        return bytes(self._data[offset:offset + DIR_ENTRY_SIZE])
+
+    def entry_offset(self, slot):
+        """Image offset of a directory slot"""
+        region = bisect_right(self._region_slots, slot) - 1
+        return self._region_offsets[region] + (slot - self._region_slots[region]) * DIR_ENTRY_SIZE
+
+    def grow(self, offset, length):
+        """Append a zeroed region (a new cluster) and make its slots available"""
+        first_slot = self._slot_count
+        self._region_slots.append(first_slot)
+        self._region_offsets.append(offset)
+        self._data.extend(bytes(length))
+        self._slot_count += length // DIR_ENTRY_SIZE
+        for slot in range(first_slot, self._slot_count):
+            heapq.heappush(self._free_slots, slot)
+
+    def lookup(self, name):
+        """Return a live view of the entry for a file name, or None when absent"""
+        slot = self._slots.get(self._key(name))
+        if slot is None:
+            return None
+        return DirEntry(self._data, slot)
+
+    def _write_slot(self, slot, entry_data):
+        offset = slot * DIR_ENTRY_SIZE
+        self._data[offset:offset + DIR_ENTRY_SIZE] = entry_data
+        self._dirty_slots.add(slot)
+
+    def _slot_of(self, name):
+        slot = self._slots.get(self._key(name))
+        if slot is None:
+            raise FileNotFoundError(f"File '{name}' not found")
+        return slot
+
+    def add(self, entry_data):
+        """Store a new entry in the lowest free slot and index it"""
+        key = bytes(entry_data[0:FILE_NAME_SIZE + FILE_EXT_SIZE]).upper()
+        if key in self._slots:
+            raise InvalidFileNameError(f"File '{format_entry_name(entry_data)}' already exists")
+        if not self._free_slots:
+            raise NotEnoughSpaceError("There are no available directory entries")
+
+        slot = heapq.heappop(self._free_slots)
+        from_tail = self._data[slot * DIR_ENTRY_SIZE] == ENTRY_FREE
+        self._write_slot(slot, entry_data)
+
+        next_offset = (slot + 1) * DIR_ENTRY_SIZE
+        if from_tail and slot + 1 < self._slot_count and self._data[next_offset] != ENTRY_FREE:
+            # keep the end-of-directory marker right behind a slot taken from the unused tail
+            self._data[next_offset] = ENTRY_FREE
+            self._dirty_slots.add(slot + 1)
+
+        self._slots[key] = slot
+        return DirEntry(self._data, slot)
+
+    def update(self, name, first_cluster=None, size=None):
+        """Patch the first cluster and/or size of an indexed entry"""
+        slot = self._slot_of(name)
+        offset = slot * DIR_ENTRY_SIZE
+        if first_cluster is not None:
+            struct.pack_into('<H', self._data, offset + 26, first_cluster)
+        if size is not None:
+            struct.pack_into('<I', self._data, offset + 28, size)
+        self._dirty_slots.add(slot)
+        return DirEntry(self._data, slot)
+
+    def rename(self, name, new_file_name):
+        """Rewrite the 8.3 name of an entry and move it in the index"""
+        slot = self._slot_of(name)
+        new_name_bytes = encode_entry_name(new_file_name)
+        old_key = self._key(name)
+        new_key = new_name_bytes.upper()
+        if new_key != old_key and new_key in self._slots:
+            raise InvalidFileNameError(f"File '{new_file_name}' already exists")
+
+        offset = slot * DIR_ENTRY_SIZE
+        self._data[offset:offset + FILE_NAME_SIZE + FILE_EXT_SIZE] = new_name_bytes
+        self._dirty_slots.add(slot)
+
+        del self._slots[old_key]
+        self._slots[new_key] = slot
+        return DirEntry(self._data, slot)
+
+    def remove(self, name):
+        """Mark an entry as deleted, free its slot and return a detached copy of it"""
+        key = self._key(name)
+        slot = self._slot_of(name)
+        removed = DirEntry(self._data, slot).detach()
+
+        del self._slots[key]
+        self._write_slot(slot, bytes([ENTRY_DELETED] + [0] * (DIR_ENTRY_SIZE - 1)))
+        heapq.heappush(self._free_slots, slot)
+        return removed
+
+    def flush(self, image):
+        """Write dirty slots back with one write per run of consecutive slots"""
+        if not self._dirty_slots:
+            return
+
+        slots = sorted(self._dirty_slots)
+        run_start = previous = slots[0]
+        for slot in slots[1:] + [None]:
+            if slot is not None and slot == previous + 1 and slot not in self._region_slots:
+                previous = slot
+                continue
+            offset = run_start * DIR_ENTRY_SIZE
+            image.write(self.entry_offset(run_start), bytes(self._data[offset:(previous + 1) * DIR_ENTRY_SIZE]))
+            if slot is not None:
+                run_start = previous = slot
+
+        self._dirty_slots.clear()
@@ -1,105 +1,569 @@
-import datetime
+import contextlib
 import os
 import struct
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from .constants import *
 from .utils import *
 from .exceptions import *
+from .cache import BlockCache, CacheInfo
+from .check import scan_volume
+from .defrag import DefragReport, fragmentation_ratio
+from .allocator import ClusterAllocator, FIRST_FIT, ALLOCATION_POLICIES
+from .directory import DirEntry, DirectoryIndex
+from .fat_table import FATTable
+from .geometry import Geometry
+from .image import DiskImage
+from .journal import journal_path, journal_pending, read_journal, discard_journal
+from .ingest import InsertResult, PlannedInsert, iter_source_chunks, read_source, source_metadata, source_size, split_source
+from .stats import IOStats, timed
+from .stream import FileReader
 
 class FAT16:
-    def __init__(self, image_path):
+    def __init__(self, image_path, allocation_policy=FIRST_FIT):
         """Initialize FAT16 filesystem handler with disk image path"""
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Disk image not found: {image_path}")
+        if allocation_policy not in ALLOCATION_POLICIES:
+            raise ValueError(f"Unknown allocation policy: {allocation_policy}")
         self.image_path = image_path
+        self.allocation_policy = allocation_policy
+        self.geometry = None
+        self._image = None
+        self._fat = None
+        self._dirs = {}
+        self._allocator = None
+        self._scrub_pending = set()
+        self.stats = None
+        self._timing = False
+
+    @classmethod
+    def open(cls, image_path, writable=False, use_mmap=False, allocation_policy=FIRST_FIT, cache_size=0):
+        """Mount a disk image once and keep it open across operations"""
+        fat = cls(image_path, allocation_policy=allocation_policy)
+        fat.mount(writable=writable, use_mmap=use_mmap, cache_size=cache_size)
+        return fat
+
+    @property
+    def mounted(self):
+        return self._image is not None
+
+    @timed
+    def mount(self, writable=False, use_mmap=False, cache_size=0):
+        """Open the image handle and parse the boot sector"""
+        if self._image is not None:
+            raise FileAccessError("Disk image is already mounted")
 
-    def _read_boot_sector(self, img_file):
-        """Read and parse FAT16 boot sector information"""
         try:
-            boot_sector = img_file.read(512)
-
-            bytes_per_sector = struct.unpack_from("<H", boot_sector, BYTES_PER_SECTOR_OFFSET)[0]
-            sectors_per_cluster = struct.unpack_from("<B", boot_sector, SECTORS_PER_CLUSTER_OFFSET)[0]
-            reserved_sectors = struct.unpack_from("<H", boot_sector, RESERVED_SECTORS_OFFSET)[0]
-            number_of_fats = struct.unpack_from("<B", boot_sector, NUMBER_OF_FATS_OFFSET)[0]
-            root_dir_entries = struct.unpack_from("<H", boot_sector, ROOT_DIR_ENTRIES_OFFSET)[0]
-            sectors_per_fat = struct.unpack_from("<H", boot_sector, SECTORS_PER_FAT_OFFSET)[0]
-
-            root_dir_start = (reserved_sectors + (number_of_fats * sectors_per_fat)) * bytes_per_sector
-
-            return bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors, sectors_per_cluster, root_dir_start
-        except struct.error as e:
-            raise InvalidDiskImageError(f"Invalid boot sector structure: {str(e)}")
-
-    def _read_disk_data(self, img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries):
-        """Read root directory data from disk"""
-        root_dir_start = bytes_per_sector * (reserved_sectors + sectors_per_fat * number_of_fats)
-        root_dir_size = root_dir_entries * DIR_ENTRY_SIZE
-
-        img_file.seek(root_dir_start)
-        root_dir_data = img_file.read(root_dir_size)
-
-        return root_dir_size, root_dir_data
+            image = DiskImage(self.image_path, writable=writable, use_mmap=use_mmap)
+        except IOError as e:
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
+        if self.stats is not None:
+            self.stats.opens += 1
+            image.stats = self.stats
 
+        try:
+            self._recover_journal(image)
+            self.geometry = Geometry.from_boot_sector(image.read(0, BOOT_SECTOR_SIZE), image.size)
+        except Exception:
+            image.close()
+            raise
+
+        if cache_size:
+            image.cache = BlockCache(cache_size, self.geometry.data_start, self.geometry.cluster_size)
+
+        self._image = image
+        return self
+
+    def _recover_journal(self, image):
+        """Finish a transaction that was interrupted after its journal was committed"""
+        path = journal_path(self.image_path)
+        if not os.path.exists(path):
+            return
+
+        runs = read_journal(path)
+        if runs is None:
+            # the commit marker never reached the disk, so the image itself was never touched
+            if image.writable:
+                discard_journal(path)
+            return
+
+        if image.writable:
+            for offset, undo, redo in runs:
+                image.write(offset, redo)
+            image.sync()
+            discard_journal(path)
+        else:
+            image.begin(BOOT_SECTOR_SIZE)
+            for offset, undo, redo in runs:
+                image.stage(offset, redo)
+
+    def _drop_metadata(self):
+        """Forget cached FAT, directory and allocator state"""
+        self._fat = None
+        self._dirs = {}
+        self._allocator = None
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Buffer every mutation in memory and commit it atomically through a sidecar journal"""
+        if self._image is not None and not self._image.writable:
+            raise FileAccessError("Disk image is mounted read-only")
+        if self._image is not None and self._image.in_transaction:
+            yield self
+            return
+
+        with self._session(writable=True) as image:
+            path = journal_path(self.image_path)
+            if journal_pending(path):
+                raise FileAccessError("A committed transaction is still pending; remount the image to recover it")
+            image.begin(self.geometry.bytes_per_sector)
+            try:
+                yield self
+                self.flush()
+                try:
+                    image.commit(path)
+                except IOError as e:
+                    self._finish_failed_commit(image, path)
+                    raise FileAccessError(f"Could not commit transaction: {str(e)}")
+            except BaseException:
+                image.rollback()
+                self._drop_metadata()
+                raise
+
+    def _finish_failed_commit(self, image, path):
+        """Replay a journal whose runs failed to apply, or unmount so the next mount replays it"""
+        if not journal_pending(path):
+            return
+        try:
+            self._recover_journal(image)
+        except (IOError, FAT16Error):
+            # the image can't be trusted half-written; drop the mount and leave the journal for recovery
+            self._image = None
+            self._drop_metadata()
+            try:
+                image.close()
+            except IOError:
+                pass
+
+    def _attach_stats(self, stats):
+        """Point the image handle and the cached FAT at a stats collector, or detach them with None"""
+        self.stats = stats
+        if self._image is not None:
+            self._image.stats = stats
+        if self._fat is not None:
+            self._fat.stats = stats
+
+    def enable_stats(self, hooks=()):
+        """Start collecting I/O counters and operation latencies and return the collector"""
+        stats = IOStats(hooks)
+        self._attach_stats(stats)
+        return stats
+
+    def disable_stats(self):
+        """Stop collecting statistics"""
+        self._attach_stats(None)
+
+    @contextlib.contextmanager
+    def profile(self, hooks=()):
+        """Collect statistics for the duration of a with block into a fresh collector"""
+        previous = self.stats
+        stats = self.enable_stats(hooks)
+        try:
+            yield stats
+        finally:
+            self._attach_stats(previous)
+
+    def cache_info(self):
+        """Return hit, miss and eviction counters of the cluster read cache"""
+        if self._image is None or self._image.cache is None:
+            return CacheInfo(0, 0, 0, 0, 0)
+        return self._image.cache.info()
+
+    @timed
+    def flush(self):
+        """Write pending changes back to the disk image"""
+        if self._image is None:
+            return
+        try:
+            if self._fat is not None:
+                self._fat.flush(self._image)
+            for directory in self._dirs.values():
+                directory.flush(self._image)
+            self._image.flush()
+        except IOError as e:
+            raise FileAccessError(f"Could not flush disk image: {str(e)}")
+
+    @timed
+    def close(self):
+        """Flush pending changes and release the disk image"""
+        if self._image is None:
+            return
+        image = self._image
+        try:
+            self.flush()
+        finally:
+            self._image = None
+            self._drop_metadata()
+            image.close()
+
+    def __enter__(self):
+        if self._image is None:
+            self.mount()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextlib.contextmanager
+    def _session(self, writable=False):
+        """Reuse the mounted image, or mount it for the duration of one call"""
+        if self._image is not None:
+            if writable and not self._image.writable:
+                raise FileAccessError("Disk image is mounted read-only")
+            yield self._image
+            return
+
+        self.mount(writable=writable)
+        try:
+            yield self._image
+        finally:
+            self.close()
+
+    def _fat_table(self, image):
+        """Return the cached FAT, loading it on first use"""
+        if self._fat is None:
+            self._fat = FATTable.load(image, self.geometry)
+            self._fat.stats = self.stats
+        return self._fat
+
+    def _directory(self, image, first_cluster):
+        """Return the cached index of a directory, parsing it on first use"""
+        directory = self._dirs.get(first_cluster)
+        if directory is None:
+            if first_cluster == 0:
+                directory = DirectoryIndex.load_root(image, self.geometry)
+            else:
+                extents = self._fat_table(image).extents(first_cluster)
+                directory = DirectoryIndex.load_chain(image, self.geometry, extents, first_cluster)
+            if self.stats is not None:
+                self.stats.dir_entries += directory.scanned
+            self._dirs[first_cluster] = directory
+        return directory
+
+    def _root_dir(self, image):
+        """Return the root directory index, building it on first use"""
+        return self._directory(image, 0)
+
+    def _resolve_dir(self, image, path):
+        """Follow a directory path from the root through the directory cache"""
+        directory = self._root_dir(image)
+        for part in split_path(path):
+            record = directory.lookup(part)
+            if record is None or not record.attributes & DIRECTORY:
+                raise FileNotFoundError(f"Directory '{path}' not found")
+            directory = self._directory(image, record.first_cluster)
+        return directory
+
+    def _resolve(self, image, path):
+        """Return the parent directory index and the last component of a path"""
+        parts = split_path(path)
+        if not parts:
+            raise InvalidFileNameError("Invalid file name")
+        return self._resolve_dir(image, '/'.join(parts[:-1])), parts[-1]
+
+    def _find(self, image, path):
+        """Return (parent directory, record) for a path, or (None, None) when absent"""
+        try:
+            directory, name = self._resolve(image, path)
+        except FileNotFoundError:
+            return None, None
+        record = directory.lookup(name)
+        if record is None:
+            return None, None
+        return directory, record
+
+    def _add_entry(self, image, directory, entry_data):
+        """Add an entry, extending a full subdirectory by one cluster first"""
+        if (not directory.is_root and directory.free_slot_count == 0
+                and format_entry_name(entry_data) not in directory):
+            cluster_size = self.geometry.cluster_size
+            fat = self._fat_table(image)
+            cluster = self._cluster_allocator(image).allocate(1)[0]
+            fat[fat.chain(directory.first_cluster)[-1]] = cluster
+            fat[cluster] = END_OF_CLUSTER
+            offset = self.geometry.cluster_offset(cluster)
+            image.write(offset, bytes(cluster_size))
+            directory.grow(offset, cluster_size)
+        return directory.add(entry_data)
+
+    @timed
     def list_files(self):
         """List all files in root directory"""
-        with open(self.image_path, 'rb') as img_file:
-            bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors = self._read_boot_sector(img_file)
-            root_dir_size, root_dir_data = self._read_disk_data(img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries)
-
-            files = [] 
+        return self.list_dir()
 
-            for i in range(0, root_dir_size, DIR_ENTRY_SIZE):
-                entry = root_dir_data[i:i + DIR_ENTRY_SIZE]
-                if entry[0] == ENTRY_FREE:
-                    break
-                if entry[0] == ENTRY_DELETED:
-                    continue
+    @timed
+    def list_dir(self, path=''):
+        """List (name, size) pairs for every entry of a directory"""
+        with self._session() as image:
+            files = [(name, size) for name, size in self._resolve_dir(image, path).listing()
+                     if name not in ('.', '..')]
 
-                file_name = entry[0:FILE_NAME_SIZE].decode('ascii').strip()
-                file_extension = entry[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE].decode('ascii').strip()
-                full_name = f"{file_name}.{file_extension}" if file_extension else file_name
+        return files
 
-                file_size_bytes = entry[28:32] 
-                file_size = int.from_bytes(file_size_bytes, byteorder='little')
+    def scandir(self, path=''):
+        """Yield a lazily decoded DirEntry view for every entry of a directory"""
+        if self._image is None:
+            # unmounted, read the directory in one short mount so the caller can write while iterating
+            with self._session() as image:
+                entries = [DirEntry(entry.raw, entry.slot, 0) for entry in self._resolve_dir(image, path)
+                           if entry.name not in ('.', '..')]
+            yield from entries
+            return
+
+        for entry in self._resolve_dir(self._image, path):
+            if entry.name not in ('.', '..'):
+                yield entry
+
+    def walk(self, top=''):
+        """Lazily yield (dirpath, dirnames, filenames) top-down, like os.walk"""
+        visited = set()
+        # a None cluster stands for top, which is resolved by path
+        stack = [(top.strip('/\\'), None)]
+        while stack:
+            path, first_cluster = stack.pop()
+
+            # each directory is read in its own session, so an unmounted instance is free between yields
+            with self._session() as image:
+                directory = self._resolve_dir(image, top) if first_cluster is None else self._directory(image, first_cluster)
+                visited.add(directory.first_cluster)
+
+                dirnames = []
+                filenames = []
+                subdirectories = {}
+                for record in directory:
+                    if record.name in ('.', '..') or record.attributes & VOLUME_LABEL:
+                        continue
+                    if record.attributes & DIRECTORY:
+                        dirnames.append(record.name)
+                        subdirectories[record.name] = record.first_cluster
+                    else:
+                        filenames.append(record.name)
+
+            yield path, dirnames, filenames
+
+            # dirnames may have been pruned by the caller, as with os.walk
+            for name in reversed(dirnames):
+                first_cluster = subdirectories.get(name)
+                if first_cluster is None or first_cluster in visited or first_cluster < FIRST_DATA_CLUSTER:
+                    continue
+                stack.append((f"{path}/{name}" if path else name, first_cluster))
+
+    def _iter_tree(self, image):
+        """Yield (path, parent directory, entry) for every file and subdirectory"""
+        visited = {0}
+        stack = [('', self._root_dir(image))]
+        while stack:
+            path, directory = stack.pop()
+            for entry in directory:
+                name = entry.name
+                if name in ('.', '..') or entry.attributes & VOLUME_LABEL:
+                    continue
+                child_path = f"{path}/{name}" if path else name
+                yield child_path, directory, entry
+
+                first_cluster = entry.first_cluster
+                if entry.is_directory and first_cluster >= FIRST_DATA_CLUSTER and first_cluster not in visited:
+                    visited.add(first_cluster)
+                    try:
+                        stack.append((child_path, self._directory(image, first_cluster)))
+                    except InvalidDiskImageError:
+                        # a looping directory chain is reported by the scan itself
+                        continue
 
-                files.append((full_name, file_size))
+    @timed
+    def check(self, repair=False):
+        """Scan the FAT and directory tree for inconsistencies, optionally repairing them"""
+        try:
+            with self._session(writable=repair) as image:
+                if image.writable:
+                    self.flush()
+                fat = self._fat_table(image)
+                found = list(self._iter_tree(image))
+                files = [(path, entry.first_cluster, entry.size, entry.is_directory) for path, directory, entry in found]
+                fat_copies = [image.read(self.geometry.fat_copy_start(index), self.geometry.fat_size)
+                              for index in range(self.geometry.number_of_fats)]
+
+                report, kept_chains = scan_volume(fat.entries, self.geometry.total_clusters,
+                                                  self.geometry.cluster_size, files, fat_copies)
+                if repair and not report.clean:
+                    self._repair(image, report, kept_chains, found)
+                    report = report._replace(repaired=True)
+                return report
+        except IOError as e:
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
 
+    def _repair(self, image, report, kept_chains, found):
+        """Truncate bad chains, fix sizes, free lost clusters and resync the FAT copies"""
+        fat = self._fat_table(image)
+        cluster_size = self.geometry.cluster_size
+        owned = set()
+
+        for path, directory, entry in found:
+            chain = kept_chains[path]
+            if not entry.is_directory:
+                needed = (entry.size + cluster_size - 1) // cluster_size
+                if len(chain) > needed:
+                    chain = chain[:needed]
+                elif len(chain) < needed:
+                    directory.update(entry.name, size=len(chain) * cluster_size)
+
+            if chain and fat[chain[-1]] < END_OF_CHAIN_MIN:
+                fat[chain[-1]] = END_OF_CLUSTER
+            first_cluster = chain[0] if chain else 0
+            if first_cluster != entry.first_cluster:
+                directory.update(entry.name, first_cluster=first_cluster)
+            owned.update(chain)
+
+        entries = fat.entries
+        for cluster in range(FIRST_DATA_CLUSTER, min(len(entries), FIRST_DATA_CLUSTER + self.geometry.total_clusters)):
+            if cluster not in owned and entries[cluster] != CLUSTER_FREE and entries[cluster] != BAD_CLUSTER:
+                fat[cluster] = CLUSTER_FREE
+
+        if report.fat_mismatches:
+            fat.mark_all_dirty()
+        self.flush()
+        self._dirs = {}
+        self._allocator = None
+
+    def _file_extents(self, image):
+        """Return (path, parent directory, entry, extents) for every regular file"""
+        fat = self._fat_table(image)
+        files = []
+        for path, directory, entry in self._iter_tree(image):
+            if not entry.is_directory:
+                files.append((path, directory, entry, fat.extents(entry.first_cluster)))
         return files
 
-    def read_file(self, file):
-        """Read complete content of specified file"""
+    @timed
+    def fragmentation(self):
+        """Return the share of file cluster boundaries that are breaks between extents"""
+        with self._session() as image:
+            return fragmentation_ratio(extents for path, directory, entry, extents in self._file_extents(image))
+
+    def _relocate(self, image, directory, entry, extents, clusters):
+        """Copy a file into contiguous clusters, then switch its chain over atomically"""
+        cluster_size = self.geometry.cluster_size
+        destination = self.geometry.cluster_offset(clusters[0])
+        remaining = entry.size
+        for start_cluster, count in extents:
+            source = self.geometry.cluster_offset(start_cluster)
+            length = count * cluster_size
+            for position in range(0, length, WRITE_BLOCK_SIZE):
+                if remaining <= 0:
+                    break
+                block = image.read(source + position, min(WRITE_BLOCK_SIZE, length - position, remaining))
+                image.write(destination, block)
+                destination += len(block)
+                remaining -= len(block)
+        # the copy has to be on disk before the journal points the file at it
+        image.sync()
+
+        old_clusters = [cluster for start_cluster, count in extents for cluster in range(start_cluster, start_cluster + count)]
+        with self.transaction():
+            fat = self._fat_table(image)
+            for cluster in old_clusters:
+                fat[cluster] = CLUSTER_FREE
+            fat.link(clusters)
+            directory.update(entry.name, first_cluster=clusters[0])
+        self._release_clusters(old_clusters)
+
+    @timed
+    def defragment(self, max_bytes=None, max_seconds=None):
+        """Move fragmented files into contiguous extents, stopping once a byte or time budget is spent"""
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
         try:
-            with open(self.image_path, 'rb') as img_file:
-                bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors, sectors_per_cluster, root_dir_start = self._read_boot_sector(img_file)
-                root_dir_size, root_dir_data = self._read_disk_data(img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries)
-
-                content = None
-
-                for i in range(0, root_dir_size, DIR_ENTRY_SIZE):
-                    entry = root_dir_data[i:i + DIR_ENTRY_SIZE]
-                    if entry[0] == ENTRY_FREE:
+            with self._session(writable=True) as image:
+                files = self._file_extents(image)
+                before = fragmentation_ratio(extents for path, directory, entry, extents in files)
+                allocator = self._cluster_allocator(image)
+
+                files_moved = 0
+                bytes_moved = 0
+                files_skipped = 0
+                complete = True
+                for path, directory, entry, extents in sorted(files, key=lambda file: file[2].first_cluster):
+                    if len(extents) < 2:
+                        continue
+                    if ((max_bytes is not None and bytes_moved >= max_bytes)
+                            or (deadline is not None and time.monotonic() >= deadline)):
+                        complete = False
                         break
-                    if entry[0] == ENTRY_DELETED:
+
+                    count = sum(extent[1] for extent in extents)
+                    clusters = allocator.allocate_extent(count)
+                    if clusters is None:
+                        files_skipped += 1
                         continue
+                    try:
+                        self._relocate(image, directory, entry, extents, clusters)
+                    except BaseException:
+                        if self._allocator is not None:
+                            self._allocator.release(clusters)
+                        raise
+                    files_moved += 1
+                    bytes_moved += entry.size
+
+                after = fragmentation_ratio(extents for path, directory, entry, extents in self._file_extents(image))
+                return DefragReport(before, after, files_moved, bytes_moved, files_skipped, complete)
+        except IOError as e:
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
 
-                    file_name = entry[0:FILE_NAME_SIZE].decode('ascii').strip()
-                    file_extension = entry[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE].decode('ascii').strip()
-                    full_name = f"{file_name}.{file_extension}" if file_extension else file_name
+    def _locate_file(self, image, file):
+        """Return the directory record of a file and its cluster extents"""
+        directory, record = self._find(image, file)
+        if record is None:
+            raise FileNotFoundError(f"File '{file}' not found")
+        return record, self._fat_table(image).extents(record.first_cluster)
 
-                    if full_name == file:
-                        first_cluster = struct.unpack_from("<H", entry, 26)[0]
-                        file_size_bytes = entry[28:32] 
-                        file_size = int.from_bytes(file_size_bytes, byteorder='little')
-                        
-                        first_data_sector = reserved_sectors + number_of_fats * sectors_per_fat + (root_dir_entries * DIR_ENTRY_SIZE + bytes_per_sector - 1) // bytes_per_sector
-                        file_content_start = (first_data_sector + (first_cluster - 2) * sectors_per_cluster) * bytes_per_sector
+    def _file_reader(self, image, file):
+        """Build a reader over the cluster extents of a file"""
+        record, extents = self._locate_file(image, file)
+        return FileReader(image, self.geometry, extents, record.size, name=record.name)
 
-                        img_file.seek(file_content_start)
-                        content = img_file.read(file_size)
-                        break
+    @timed
+    def open_file(self, file):
+        """Open a file as a seekable binary stream that follows its cluster chain"""
+        if self._image is not None:
+            return self._file_reader(self._image, file)
+
+        with self._session() as image:
+            record, extents = self._locate_file(image, file)
+
+        # each unmounted reader owns its handle, so closing one never pulls the image from under another
+        try:
+            image = DiskImage(self.image_path)
+        except IOError as e:
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
+        try:
+            self._recover_journal(image)
+        except Exception:
+            image.close()
+            raise
+        if self.stats is not None:
+            self.stats.opens += 1
+            image.stats = self.stats
+        return FileReader(image, self.geometry, extents, record.size, name=record.name, on_close=image.close)
+
+    @timed
+    def read_file(self, file):
+        """Read complete content of specified file"""
+        try:
+            with self._session() as image:
+                with self._file_reader(image, file) as reader:
+                    content = reader.readall()
 
-            if content is None:
-                raise FileNotFoundError(f"File '{file}' not found")
             try:
                 return content.decode('latin-1')
             except UnicodeDecodeError:
@@ -107,238 +571,347 @@ class FAT16:
         except (IOError, struct.error) as e:
             raise FileAccessError(f"Error reading file: {str(e)}")
 
+    @timed
     def get_file_attributes(self, file):
         """Get attributes and metadata for specified file"""
         try:
-            with open(self.image_path, 'rb') as img_file:
-                bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors, sectors_per_cluster, root_dir_start = self._read_boot_sector(img_file)
-                root_dir_size, root_dir_data = self._read_disk_data(img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries)
-            
-            for i in range(0, root_dir_size, DIR_ENTRY_SIZE):
-                    entry = root_dir_data[i:i + DIR_ENTRY_SIZE]
-                    if entry[0] == ENTRY_FREE:
-                        break
-                    if entry[0] == ENTRY_DELETED:
-                        continue
-
-                    file_name = entry[0:FILE_NAME_SIZE].decode('ascii').strip()
-                    file_extension = entry[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE].decode('ascii').strip()
-                    full_name = f"{file_name}.{file_extension}" if file_extension else file_name
-
-                    if full_name == file:
-                        file_attribute_byte = entry[11]
-                        file_attribute = int(file_attribute_byte)
-
-                        file_time_created_byte = entry[22:24]
-                        file_time = decode_time(file_time_created_byte)
-
-                        file_date_created_byte = entry[24:26]
-                        file_date = decode_date(file_date_created_byte)
-
-                        is_read_only = bool(file_attribute & READ_ONLY)
-                        is_hidden = bool(file_attribute & HIDDEN)
-                        is_system = bool(file_attribute & SYSTEM)
-
-                        return {
-                            "file_name": file,
-                            "read_only": is_read_only,
-                            "hidden": is_hidden,
-                            "system": is_system,
-                            "time_created": file_time,
-                            "date_created": file_date
-                        }
-            
-            raise FileNotFoundError(f"File '{file}' not found")
+            with self._session() as image:
+                directory, record = self._find(image, file)
+                if record is None:
+                    raise FileNotFoundError(f"File '{file}' not found")
+                entry = directory.entry(record.slot)
+
+            file_attribute = record.attributes
+
+            file_time_created_byte = entry[22:24]
+            file_time = decode_time(file_time_created_byte)
+
+            file_date_created_byte = entry[24:26]
+            file_date = decode_date(file_date_created_byte)
+
+            is_read_only = bool(file_attribute & READ_ONLY)
+            is_hidden = bool(file_attribute & HIDDEN)
+            is_system = bool(file_attribute & SYSTEM)
+
+            return {
+                "file_name": file,
+                "read_only": is_read_only,
+                "hidden": is_hidden,
+                "system": is_system,
+                "time_created": file_time,
+                "date_created": file_date
+            }
         except IOError as e:
             raise FileAccessError(f"Could not access disk image: {str(e)}")    
     
+    @timed
     def rename_file(self, file, new_file_name): 
         """Rename a file in the filesystem"""
-        with open(self.image_path, 'r+b') as img_file:
-            bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors, sectors_per_cluster, root_dir_start = self._read_boot_sector(img_file)
-            root_dir_size, root_dir_data = self._read_disk_data(img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries)
-
-            name_part, ext_part = split_filename(new_file_name)
-            if not name_part:
-                raise InvalidFileNameError("Invalid file name")
-
-            new_file_name_bytes = name_part.ljust(FILE_NAME_SIZE).encode('ascii') + ext_part.ljust(FILE_EXT_SIZE).encode('ascii')
-
-            for i in range(0, root_dir_size, DIR_ENTRY_SIZE):
-                entry = root_dir_data[i:i + DIR_ENTRY_SIZE]
-                if entry[0] == ENTRY_FREE:
-                    break
-                if entry[0] == ENTRY_DELETED:
-                    continue
-                
-                file_name = entry[0:FILE_NAME_SIZE].decode('ascii').strip()
-                file_extension = entry[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE].decode('ascii').strip()
-                full_name = f"{file_name}.{file_extension}" if file_extension else file_name
-
-                if full_name == file:
-                    file_position = root_dir_start + i 
-                    img_file.seek(file_position)
-                    img_file.write(new_file_name_bytes)
-                    return True
-
-        return False
-
-    def _find_free_clusters(self, img_file, num_clusters, fat_start, fat_size):
-        """Find contiguous free clusters in FAT"""
-        img_file.seek(fat_start)
-        fat = img_file.read(fat_size)
-
-        free_clusters = []
-        for i in range(2, len(fat) // 2):
-            if struct.unpack_from('<H', fat, i * 2)[0] == 0x0000:
-                free_clusters.append(i)
-                if len(free_clusters) == num_clusters:
-                    break
-        return free_clusters
-
-    def _update_fat(self, img_file, clusters, fat_start):
+        with self._session(writable=True) as image:
+            directory, record = self._find(image, file)
+            if record is None:
+                return False
+
+            directory.rename(record.name, new_file_name)
+            return True
+
+    def _cluster_allocator(self, image):
+        """Return the free-cluster allocator, building it from the FAT on first use"""
+        if self._allocator is None:
+            fat = self._fat_table(image)
+            self._allocator = ClusterAllocator(fat, self.geometry.total_clusters, self.allocation_policy)
+        return self._allocator
+
+    def _release_clusters(self, clusters):
+        """Hand freed clusters back to the allocator if it has been built"""
+        if self._allocator is not None:
+            self._allocator.release(clusters)
+
+    @timed
+    def free_space(self):
+        """Return the number of free bytes in the data region"""
+        with self._session() as image:
+            return self._cluster_allocator(image).free_count * self.geometry.cluster_size
+
+    @timed
+    def has_space(self, size):
+        """Check whether a file of size bytes fits in the free clusters"""
+        with self._session() as image:
+            cluster_size = self.geometry.cluster_size
+            return self._cluster_allocator(image).has_space((size + cluster_size - 1) // cluster_size)
+
+    def _update_fat(self, image, clusters):
         """Update FAT with cluster chain"""
-        for i in range(len(clusters) - 1):
-            img_file.seek(fat_start + clusters[i] * 2)
-            img_file.write(struct.pack('<H', clusters[i + 1]))
-
-        img_file.seek(fat_start + clusters[-1] * 2)
-        img_file.write(struct.pack('<H', END_OF_CLUSTER))
-
-    def _write_file_content(self, img_file, content, clusters, data_start, bytes_per_sector, sectors_per_cluster):
-        """Write file content to allocated clusters"""
-        cluster_size = bytes_per_sector * sectors_per_cluster
-        for i, cluster in enumerate(clusters):
-            file_path = data_start + (cluster - 2) * cluster_size
-            img_file.seek(file_path)
-            img_file.write(content[i * cluster_size: (i + 1) * cluster_size])
+        self._fat_table(image).link(clusters)
+
+    def _write_file_content(self, image, content, clusters):
+        """Write file content to allocated clusters, one write per contiguous run"""
+        cluster_size = self.geometry.cluster_size
+        content = memoryview(content)
+        run_start = 0
+        for i in range(1, len(clusters) + 1):
+            if i < len(clusters) and clusters[i] == clusters[i - 1] + 1:
+                continue
+            chunk = content[run_start * cluster_size:i * cluster_size]
+            if len(chunk):
+                image.write(self.geometry.cluster_offset(clusters[run_start]), chunk)
+            run_start = i
+
+    def _build_entry(self, file_name, attributes, creation_date, first_cluster, file_size):
+        """Build a raw 32-byte directory entry"""
+        entry_data = bytearray(DIR_ENTRY_SIZE)
+        entry_data[0:FILE_NAME_SIZE+FILE_EXT_SIZE] = encode_entry_name(file_name)
+        entry_data[11] = attributes
+        entry_data[22:24] = encode_time(creation_date)
+        entry_data[24:26] = encode_date(creation_date)
+        entry_data[26:28] = struct.pack('<H', first_cluster)
+        entry_data[28:32] = struct.pack('<I', file_size)
+        return entry_data
+
+    def _write_block(self, image, allocator, block, clusters, reserved):
+        """Write one block of streamed data into reserved or newly allocated clusters"""
+        cluster_size = self.geometry.cluster_size
+        needed = (len(block) + cluster_size - 1) // cluster_size
+        new_clusters = reserved[:needed]
+        del reserved[:needed]
+        if len(new_clusters) < needed:
+            new_clusters += allocator.allocate(needed - len(new_clusters))
+
+        clusters.extend(new_clusters)
+        self._write_file_content(image, block, new_clusters)
+
+    @timed
+    def write_file(self, file_name, source, size=None):
+        """Stream a path, binary file object or iterator of byte chunks into a new file"""
+        try:
+            with self._session(writable=True) as image:
+                cluster_size = self.geometry.cluster_size
+                block_size = max(cluster_size, WRITE_BLOCK_SIZE // cluster_size * cluster_size)
+                directory, name = self._resolve(image, file_name)
+                allocator = self._cluster_allocator(image)
+                attributes, creation_date = source_metadata(source)
+
+                reserved = []
+                if size is not None:
+                    # reserving the whole file up front keeps it in as few runs as possible
+                    reserved = allocator.allocate((size + cluster_size - 1) // cluster_size)
+
+                try:
+                    record = self._add_entry(image, directory, self._build_entry(name, attributes, creation_date, 0, 0))
+                except BaseException:
+                    allocator.release(reserved)
+                    raise
+
+                clusters = []
+                file_size = 0
+                try:
+                    buffer = bytearray()
+                    for chunk in iter_source_chunks(source, block_size):
+                        buffer += chunk
+                        while len(buffer) >= block_size:
+                            self._write_block(image, allocator, buffer[:block_size], clusters, reserved)
+                            del buffer[:block_size]
+                            file_size += block_size
+                    if buffer:
+                        self._write_block(image, allocator, buffer, clusters, reserved)
+                        file_size += len(buffer)
+                except BaseException:
+                    allocator.release(clusters + reserved)
+                    directory.remove(record.name)
+                    raise
+
+                allocator.release(reserved)
+                self._update_fat(image, clusters)
+                directory.update(record.name, first_cluster=clusters[0] if clusters else 0, size=file_size)
+                return file_size
+        except IOError as e:
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
 
+    @timed
     def insert_external_file(self, external_file_path):
         """Insert external file into FAT16 filesystem"""
         if not os.path.exists(external_file_path):
             raise FileNotFoundError(f"Source file not found: {external_file_path}")
-        
-        try: 
-            with open(external_file_path, 'rb') as external_file:
-                file_content = external_file.read()
-            file_size = len(file_content)
-        except IOError as e:
-            raise FileAccessError(f"Could not read source file: {str(e)}")
 
+        self.write_file(os.path.basename(external_file_path), external_file_path)
+
+    def _insert_name(self, item):
+        """Name to report for a batch source: its 8.3 entry name, or the name as given if that is invalid"""
+        name = item[0] if isinstance(item, tuple) else getattr(item, 'name', item)
+        if not isinstance(name, (str, bytes, os.PathLike)):
+            return None
+        name = os.path.basename(os.fsdecode(name).replace('\\', '/').rstrip('/'))
         try:
-            with open(self.image_path, 'r+b') as img_file:
-                bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors, sectors_per_cluster, root_dir_start = self._read_boot_sector(img_file)
-                root_dir_size, root_dir_data = self._read_disk_data(img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries)
-
-                fat_start = reserved_sectors * bytes_per_sector
-                fat_size = sectors_per_fat * bytes_per_sector
-                data_start = root_dir_start + root_dir_entries * DIR_ENTRY_SIZE
-
-                clusters_needed = (file_size + bytes_per_sector * sectors_per_cluster - 1) // (bytes_per_sector * sectors_per_cluster)
-                clusters = self._find_free_clusters(img_file, clusters_needed, fat_start, fat_size)
-
-                if len(clusters) < clusters_needed:
-                    raise NotEnoughSpaceError("There are not enough free clusters")
-
-                attributes = get_attributes(external_file_path)
-                file_metadata = os.stat(external_file_path)
-
-                time_creation = file_metadata.st_ctime
-                creation_date = datetime.datetime.fromtimestamp(time_creation)
-
-                time_created = (creation_date.hour * 3600 + creation_date.minute * 60 + creation_date.second) // 2
-                year = creation_date.year - 1980
-                month = creation_date.month
-                day = creation_date.day
-                date_created = (year << 9) | (month << 5) | day
-
-                entry_found = False
-                for i in range(0, root_dir_size, DIR_ENTRY_SIZE):
-                    entry = root_dir_data[i:i + DIR_ENTRY_SIZE]
-
-                    if entry[0] == ENTRY_FREE or entry[0] == ENTRY_DELETED:
-                        file_position = root_dir_start + i
-                        img_file.seek(file_position)
-
-                        name, ext = os.path.basename(external_file_path).rsplit('.', 1)
-                        name_part, ext_part = split_filename(f"{name}.{ext}")
-
-                        entry_data = bytearray(DIR_ENTRY_SIZE)
-                        entry_data[0:FILE_NAME_SIZE] = name_part.ljust(FILE_NAME_SIZE).encode('ascii')
-                        entry_data[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE] = ext_part.ljust(FILE_EXT_SIZE).encode('ascii')
-                        entry_data[11] = attributes
-                        entry_data[22:24] = encode_time(time_created)
-                        entry_data[24:26] = encode_date(date_created)
-                        entry_data[26:28] = struct.pack('<H', clusters[0])
-                        entry_data[28:32] = struct.pack('<I', file_size)
-                        
-                        img_file.write(entry_data)
-                        entry_found = True
-                        break
-                
-                if not entry_found:
-                    raise NotEnoughSpaceError("There are no available directory entries")
-                
-                self._update_fat(img_file, clusters, fat_start)
-                self._write_file_content(img_file, file_content, clusters, data_start, bytes_per_sector, sectors_per_cluster)
+            return format_entry_name(encode_entry_name(name))
+        except FAT16Error:
+            return name
+
+    def _plan_insert(self, image, allocator, index, item, planned_names, planned_counts):
+        """Validate one batch source and reserve its clusters once its size is known"""
+        path, source = split_source(item)
+        directory, name = self._resolve(image, path)
+        entry_name = format_entry_name(encode_entry_name(name))
+        key = (directory.first_cluster, normalize_name(entry_name))
+        if entry_name in directory or key in planned_names:
+            raise InvalidFileNameError(f"File '{entry_name}' already exists")
+        if directory.is_root and planned_counts[directory.first_cluster] >= directory.free_slot_count:
+            raise NotEnoughSpaceError("There are no available directory entries")
+
+        attributes, creation_date = source_metadata(source)
+        file_size = source_size(source)
+        clusters = None
+        if file_size is not None:
+            clusters = allocator.allocate(self._clusters_needed(file_size))
+        planned_names.add(key)
+        planned_counts[directory.first_cluster] += 1
+        return PlannedInsert(index, directory, entry_name, source, file_size, clusters, attributes, creation_date)
+
+    def _clusters_needed(self, size):
+        """Number of clusters a file of size bytes occupies"""
+        cluster_size = self.geometry.cluster_size
+        return (size + cluster_size - 1) // cluster_size
+
+    def _load_planned(self, plan):
+        """Read a planned source on a worker thread"""
+        content = read_source(plan.source)
+        if plan.size is not None and len(content) != plan.size:
+            raise FileAccessError(f"Source for '{plan.name}' changed size while being read")
+        return content
+
+    def _write_planned(self, image, allocator, results, plan, future):
+        """Write one loaded source into its clusters, allocating them now if its size was unknown"""
+        try:
+            content = future.result()
+            if plan.clusters is None:
+                plan.size = len(content)
+                plan.clusters = allocator.allocate(self._clusters_needed(plan.size))
+        except (FAT16Error, OSError, TypeError) as e:
+            allocator.release(plan.clusters or [])
+            results[plan.index] = InsertResult(plan.name, None, e)
+            return None
+
+        self._write_file_content(image, content, plan.clusters)
+        return plan
+
+    @timed
+    def insert_many(self, sources, max_workers=None):
+        """Insert many paths or streams with one allocation plan and one metadata commit"""
+        items = list(sources)
+        results = [None] * len(items)
+        planned = []
+
+        try:
+            with self._session(writable=True) as image:
+                allocator = self._cluster_allocator(image)
+
+                planned_names = set()
+                planned_counts = Counter()
+                for index, item in enumerate(items):
+                    try:
+                        planned.append(self._plan_insert(image, allocator, index, item, planned_names, planned_counts))
+                    except (FAT16Error, OSError) as e:
+                        results[index] = InsertResult(self._insert_name(item), None, e)
+
+                # bound how many sources sit in memory while the writer catches up
+                window = max_workers or min(32, (os.cpu_count() or 1) + 4)
+                written = []
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    in_flight = deque()
+                    for plan in planned:
+                        in_flight.append((plan, executor.submit(self._load_planned, plan)))
+                        if len(in_flight) >= window:
+                            written.append(self._write_planned(image, allocator, results, *in_flight.popleft()))
+                    while in_flight:
+                        written.append(self._write_planned(image, allocator, results, *in_flight.popleft()))
+
+                fat = self._fat_table(image)
+                for plan in written:
+                    if plan is None:
+                        continue
+                    first_cluster = plan.clusters[0] if plan.clusters else 0
+                    entry_data = self._build_entry(plan.name, plan.attributes, plan.creation_date, first_cluster, plan.size)
+                    try:
+                        self._add_entry(image, plan.directory, entry_data)
+                    except NotEnoughSpaceError as e:
+                        # a full subdirectory found no cluster to grow into; only this file is left out
+                        allocator.release(plan.clusters)
+                        results[plan.index] = InsertResult(plan.name, None, e)
+                        continue
+                    fat.link(plan.clusters)
+                    results[plan.index] = InsertResult(plan.name, plan.size, None)
+
+                self.flush()
         except IOError as e:
             raise FileAccessError(f"Could not access disk image: {str(e)}")
 
+        return results
 
-    def delete_file(self, file): 
+    @timed
+    def delete_file(self, file, zero_data=ZERO_IMMEDIATE):
         """Delete file from filesystem and free allocated clusters"""
-        try:
-            with open(self.image_path, 'r+b') as img_file:
-                bytes_per_sector, sectors_per_fat, number_of_fats, root_dir_entries, reserved_sectors, sectors_per_cluster, root_dir_start = self._read_boot_sector(img_file)
-                root_dir_size, root_dir_data = self._read_disk_data(img_file, bytes_per_sector, reserved_sectors, sectors_per_fat, number_of_fats, root_dir_entries)
+        return self.delete_many([file], zero_data=zero_data)[0]
 
-                first_data_sector = reserved_sectors + number_of_fats * sectors_per_fat + (root_dir_entries * DIR_ENTRY_SIZE + bytes_per_sector - 1) // bytes_per_sector
+    def _zero_clusters(self, image, clusters):
+        """Zero clusters with one range write per contiguous run"""
+        cluster_size = self.geometry.cluster_size
+        for start, count in group_runs(clusters):
+            image.zero_range(self.geometry.cluster_offset(start), count * cluster_size)
 
-                for i in range(0, root_dir_size, DIR_ENTRY_SIZE):
-                    entry = root_dir_data[i:i + DIR_ENTRY_SIZE]
-                    if entry[0] == ENTRY_FREE:
-                        break
-                    if entry[0] == ENTRY_DELETED:
-                        continue
-                    
-                    file_name = entry[0:FILE_NAME_SIZE].decode('ascii').strip()
-                    file_extension = entry[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE].decode('ascii').strip()
-                    full_name = f"{file_name}.{file_extension}" if file_extension else file_name
-
-                    if full_name == file:
-                        file_position = root_dir_start + i 
-                        try:
-                            img_file.seek(file_position)
-                            first_cluster = struct.unpack_from("<H", entry, 26)[0]
-                            img_file.write(bytes([ENTRY_DELETED] + [0] * (DIR_ENTRY_SIZE - 1)))
-
-                            fat_start = reserved_sectors * bytes_per_sector
-                            
-                            current_cluster = first_cluster
-                            clusters_to_clear = []
-
-                            while current_cluster < END_OF_CLUSTER:
-                                clusters_to_clear.append(current_cluster)
-
-                                img_file.seek(fat_start + current_cluster * 2)
-                                next_cluster = struct.unpack_from('<H', img_file.read(2))[0]
-
-                                if next_cluster >= END_OF_CLUSTER:
-                                    break
-
-                                current_cluster = next_cluster
-
-                            for cluster in clusters_to_clear:
-                                cluster_offset = (first_data_sector + (cluster - 2) * sectors_per_cluster) * bytes_per_sector
-                                img_file.seek(cluster_offset)
-                                img_file.write(b'\x00' * (sectors_per_cluster * bytes_per_sector))
-                                
-                                img_file.seek(fat_start + cluster * 2)
-                                img_file.write(struct.pack('<H', 0x0000))
-                            
-                            return True
-                        except IOError as e:
-                            raise FileAccessError(f"Delete operation failed: {str(e)}")
-            return False
+    @timed
+    def delete_many(self, names, zero_data=ZERO_IMMEDIATE):
+        """Delete several files in one pass and return whether each one existed"""
+        if zero_data not in ZERO_POLICIES:
+            raise ValueError(f"Unknown zeroing policy: {zero_data}")
+
+        try:
+            with self._session(writable=True) as image:
+                found = []
+                for name in names:
+                    directory, record = self._find(image, name)
+                    if record is not None and record.attributes & DIRECTORY and record.first_cluster >= FIRST_DATA_CLUSTER:
+                        children = self._directory(image, record.first_cluster)
+                        if any(child.name not in ('.', '..') for child in children):
+                            raise FileAccessError(f"Directory '{name}' is not empty")
+                    found.append((directory, record.name if record is not None else None))
+
+                fat = self._fat_table(image)
+                results = []
+                freed = []
+                try:
+                    for directory, entry_name in found:
+                        if entry_name is None or entry_name not in directory:
+                            results.append(False)
+                            continue
+                        record = directory.remove(entry_name)
+                        if record.attributes & DIRECTORY:
+                            self._dirs.pop(record.first_cluster, None)
+                        freed.extend(fat.free_chain(record.first_cluster))
+                        results.append(True)
+
+                    self._release_clusters(freed)
+                    if zero_data == ZERO_IMMEDIATE:
+                        self._zero_clusters(image, freed)
+                    elif zero_data == ZERO_DEFERRED:
+                        self._scrub_pending.update(freed)
+                    self.flush()
+                    return results
+                except IOError as e:
+                    raise FileAccessError(f"Delete operation failed: {str(e)}")
         except IOError as e:
-            raise FileAccessError(f"Could not access disk image: {str(e)}")
\ No newline at end of file
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
+
+    @timed
+    def scrub(self):
+        """Zero clusters freed by deferred deletes that are still free, returning the bytes zeroed"""
+        if not self._scrub_pending:
+            return 0
+        try:
+            with self._session(writable=True) as image:
+                fat = self._fat_table(image)
+                clusters = [cluster for cluster in self._scrub_pending if fat[cluster] == CLUSTER_FREE]
+                self._zero_clusters(image, clusters)
+                self._scrub_pending.clear()
+                self.flush()
+                return len(clusters) * self.geometry.cluster_size
+        except IOError as e:
+            raise FileAccessError(f"Could not access disk image: {str(e)}")
@@ -0,0 +1,125 @@
+import sys
+from array import array
+from .constants import *
+from .exceptions import *
+
+class FATTable:
+    """In-memory copy of the FAT with dirty-sector write-back to every FAT copy"""
+
+    def __init__(self, geometry, data):
+        """Build the table from the raw bytes of the first FAT copy"""
+        self.geometry = geometry
+        self._entries = array('H')
+        self._entries.frombytes(bytes(data[:len(data) - len(data) % FAT_ENTRY_SIZE]))
+        if sys.byteorder == 'big':
+            self._entries.byteswap()
+        self._entries_per_sector = geometry.bytes_per_sector // FAT_ENTRY_SIZE
+        self._dirty_sectors = set()
+        self.stats = None
+
+    @classmethod
+    def load(cls, image, geometry):
+        """Read the first FAT copy from the image in a single read"""
+        return cls(geometry, image.read(geometry.fat_start, geometry.fat_size))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, cluster):
+        return self._entries[cluster]
+
+    def __setitem__(self, cluster, value):
+        self._entries[cluster] = value
+        self._dirty_sectors.add(cluster // self._entries_per_sector)
+        if self.stats is not None:
+            self.stats.fat_entries += 1
+
+    @property
+    def dirty(self):
+        return bool(self._dirty_sectors)
+
+    @property
+    def entries(self):
+        """The raw entry array; callers must write through __setitem__"""
+        return self._entries
+
+    def mark_all_dirty(self):
+        """Schedule the whole table to be rewritten to every FAT copy"""
+        sectors = (len(self._entries) + self._entries_per_sector - 1) // self._entries_per_sector
+        self._dirty_sectors.update(range(sectors))
+
+    def is_end_of_chain(self, value):
+        """Check whether a FAT value terminates a cluster chain"""
+        return value < FIRST_DATA_CLUSTER or value >= BAD_CLUSTER
+
+    def chain(self, first_cluster):
+        """Return the list of clusters in the chain starting at first_cluster"""
+        clusters = []
+        entries = self._entries
+        limit = len(entries)
+        cluster = first_cluster
+
+        while FIRST_DATA_CLUSTER <= cluster < limit:
+            clusters.append(cluster)
+            if len(clusters) > limit:
+                raise InvalidDiskImageError(f"Cluster chain starting at {first_cluster} loops")
+            cluster = entries[cluster]
+            if self.is_end_of_chain(cluster):
+                break
+
+        if self.stats is not None:
+            self.stats.fat_entries += len(clusters)
+        return clusters
+
+    def extents(self, first_cluster):
+        """Group a chain into runs of contiguous clusters as (start, count) pairs"""
+        extents = []
+        for cluster in self.chain(first_cluster):
+            if extents and extents[-1][0] + extents[-1][1] == cluster:
+                extents[-1][1] += 1
+            else:
+                extents.append([cluster, 1])
+        return [tuple(extent) for extent in extents]
+
+    def link(self, clusters):
+        """Write clusters as a single chain terminated by an end-of-chain marker"""
+        for i in range(len(clusters) - 1):
+            self[clusters[i]] = clusters[i + 1]
+        if clusters:
+            self[clusters[-1]] = END_OF_CLUSTER
+
+    def free_chain(self, first_cluster):
+        """Mark every cluster in a chain as free and return the freed clusters"""
+        clusters = self.chain(first_cluster)
+        for cluster in clusters:
+            self[cluster] = CLUSTER_FREE
+        return clusters
+
+    def _sector_runs(self):
+        """Group dirty sectors into runs of consecutive sectors"""
+        runs = []
+        for sector in sorted(self._dirty_sectors):
+            if runs and runs[-1][1] == sector:
+                runs[-1][1] = sector + 1
+            else:
+                runs.append([sector, sector + 1])
+        return runs
+
+    def flush(self, image):
+        """Write dirty sectors back to every FAT copy with one write per run"""
+        if not self._dirty_sectors:
+            return
+
+        per_sector = self._entries_per_sector
+        bytes_per_sector = self.geometry.bytes_per_sector
+
+        for first_sector, end_sector in self._sector_runs():
+            run = self._entries[first_sector * per_sector:end_sector * per_sector]
+            if sys.byteorder == 'big':
+                run.byteswap()
+            data = run.tobytes()
+
+            for index in range(self.geometry.number_of_fats):
+                image.write(self.geometry.fat_copy_start(index) + first_sector * bytes_per_sector, data)
+
+        self._dirty_sectors.clear()
@@ -0,0 +1,105 @@
+import struct
+from collections import namedtuple
+from .constants import *
+from .exceptions import *
+
+_GEOMETRY_FIELDS = [
+    'bytes_per_sector',
+    'sectors_per_cluster',
+    'reserved_sectors',
+    'number_of_fats',
+    'root_dir_entries',
+    'sectors_per_fat',
+    'total_sectors',
+]
+
+class Geometry(namedtuple('Geometry', _GEOMETRY_FIELDS)):
+    """Immutable FAT16 volume layout parsed once from the boot sector"""
+    __slots__ = ()
+
+    @classmethod
+    def from_boot_sector(cls, boot_sector, image_size=None):
+        """Parse FAT16 boot sector information, rejecting anything that isn't a FAT16 volume"""
+        if len(boot_sector) < BOOT_SECTOR_SIZE:
+            raise InvalidDiskImageError("Disk image is too small to hold a boot sector")
+        if bytes(boot_sector[BOOT_SIGNATURE_OFFSET:BOOT_SIGNATURE_OFFSET + 2]) != BOOT_SIGNATURE:
+            raise InvalidDiskImageError("Missing boot sector signature 0x55AA")
+
+        try:
+            bytes_per_sector = struct.unpack_from("<H", boot_sector, BYTES_PER_SECTOR_OFFSET)[0]
+            sectors_per_cluster = struct.unpack_from("<B", boot_sector, SECTORS_PER_CLUSTER_OFFSET)[0]
+            reserved_sectors = struct.unpack_from("<H", boot_sector, RESERVED_SECTORS_OFFSET)[0]
+            number_of_fats = struct.unpack_from("<B", boot_sector, NUMBER_OF_FATS_OFFSET)[0]
+            root_dir_entries = struct.unpack_from("<H", boot_sector, ROOT_DIR_ENTRIES_OFFSET)[0]
+            total_sectors = struct.unpack_from("<H", boot_sector, TOTAL_SECTORS_16_OFFSET)[0]
+            sectors_per_fat = struct.unpack_from("<H", boot_sector, SECTORS_PER_FAT_OFFSET)[0]
+            if total_sectors == 0:
+                total_sectors = struct.unpack_from("<I", boot_sector, TOTAL_SECTORS_32_OFFSET)[0]
+        except struct.error as e:
+            raise InvalidDiskImageError(f"Invalid boot sector structure: {str(e)}")
+
+        if bytes_per_sector == 0 or sectors_per_cluster == 0 or number_of_fats == 0 or sectors_per_fat == 0:
+            raise InvalidDiskImageError("Invalid boot sector structure: zero-sized geometry field")
+        if bytes_per_sector & (bytes_per_sector - 1) or sectors_per_cluster & (sectors_per_cluster - 1):
+            raise InvalidDiskImageError(
+                f"Sector size {bytes_per_sector} and sectors per cluster {sectors_per_cluster} must be powers of two")
+
+        geometry = cls(bytes_per_sector, sectors_per_cluster, reserved_sectors, number_of_fats,
+                       root_dir_entries, sectors_per_fat, total_sectors)
+        if geometry.first_data_sector >= total_sectors:
+            raise InvalidDiskImageError("Volume has no room for a data region after the FATs and root directory")
+        if image_size is not None and total_sectors * bytes_per_sector > image_size:
+            raise InvalidDiskImageError(
+                f"Volume of {total_sectors * bytes_per_sector} bytes does not fit in a {image_size}-byte image")
+        if not MIN_CLUSTERS <= geometry.data_clusters <= MAX_CLUSTERS:
+            raise InvalidDiskImageError(f"{geometry.data_clusters} data clusters is outside the FAT16 range")
+        return geometry
+
+    @property
+    def cluster_size(self):
+        return self.bytes_per_sector * self.sectors_per_cluster
+
+    @property
+    def fat_start(self):
+        return self.reserved_sectors * self.bytes_per_sector
+
+    @property
+    def fat_size(self):
+        return self.sectors_per_fat * self.bytes_per_sector
+
+    @property
+    def root_dir_start(self):
+        return (self.reserved_sectors + self.number_of_fats * self.sectors_per_fat) * self.bytes_per_sector
+
+    @property
+    def root_dir_size(self):
+        return self.root_dir_entries * DIR_ENTRY_SIZE
+
+    @property
+    def first_data_sector(self):
+        root_dir_sectors = (self.root_dir_size + self.bytes_per_sector - 1) // self.bytes_per_sector
+        return self.reserved_sectors + self.number_of_fats * self.sectors_per_fat + root_dir_sectors
+
+    @property
+    def data_start(self):
+        return self.first_data_sector * self.bytes_per_sector
+
+    @property
+    def data_clusters(self):
+        """Number of clusters that fit in the data region"""
+        return max(0, (self.total_sectors - self.first_data_sector) // self.sectors_per_cluster)
+
+    @property
+    def total_clusters(self):
+        """Number of data clusters, bounded by what the FAT can address"""
+        data_clusters = self.data_clusters
+        fat_clusters = self.fat_size // 2 - 2
+        return min(data_clusters, fat_clusters) if data_clusters else fat_clusters
+
+    def fat_copy_start(self, index):
+        """Byte offset of the FAT copy with the given index"""
+        return self.fat_start + index * self.fat_size
+
+    def cluster_offset(self, cluster):
+        """Byte offset of the first byte of a data cluster"""
+        return self.data_start + (cluster - 2) * self.cluster_size
@@ -0,0 +1,302 @@
+import ctypes
+import ctypes.util
+import mmap
+import os
+import sys
+from .constants import *
+from .exceptions import *
+from .journal import write_journal, discard_journal
+
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
+def _load_fallocate():
+    """Return libc's fallocate on Linux, or None where hole punching is unavailable"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        fallocate = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True).fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+_fallocate = _load_fallocate()
+
+class DiskImage:
+    """Single open handle on a disk image, optionally backed by mmap"""
+
+    def __init__(self, image_path, writable=False, use_mmap=False):
+        """Open the disk image once for reading or reading and writing"""
+        self.image_path = image_path
+        self.writable = writable
+        self._file = open(image_path, 'r+b' if writable else 'rb')
+        self._map = None
+        self.cache = None
+        self.stats = None
+        self._overlay = None
+        self._overlay_sector_size = 512
+
+        file_stats = os.fstat(self._file.fileno())
+        allocated = getattr(file_stats, 'st_blocks', None)
+        self.sparse = allocated is not None and allocated * 512 < file_stats.st_size
+
+        if use_mmap:
+            try:
+                access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+                self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+            except (ValueError, OSError) as e:
+                self._file.close()
+                raise InvalidDiskImageError(f"Could not map disk image: {str(e)}")
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    @property
+    def size(self):
+        """Length of the image in bytes"""
+        if self._map is not None:
+            return len(self._map)
+        return os.fstat(self._file.fileno()).st_size
+
+    @property
+    def in_transaction(self):
+        return self._overlay is not None
+
+    def _count(self, seeks, read_calls, bytes_read, write_calls, bytes_written):
+        stats = self.stats
+        stats.seeks += seeks
+        stats.read_calls += read_calls
+        stats.bytes_read += bytes_read
+        stats.write_calls += write_calls
+        stats.bytes_written += bytes_written
+
+    def _read_disk(self, offset, size):
+        if self._map is not None:
+            data = self._map[offset:offset + size]
+            if self.stats is not None:
+                self._count(0, 1, len(data), 0, 0)
+            return data
+        self._file.seek(offset)
+        data = self._file.read(size)
+        if self.stats is not None:
+            self._count(1, 1, len(data), 0, 0)
+        return data
+
+    def _write_disk(self, offset, data):
+        if self.stats is not None:
+            self._count(0 if self._map is not None else 1, 0, 0, 1, len(data))
+        if self._map is not None:
+            self._map[offset:offset + len(data)] = data
+            return
+        self._file.seek(offset)
+        self._file.write(data)
+
+    def _read(self, offset, size):
+        data = self._read_disk(offset, size)
+        if not self._overlay or size <= 0:
+            return data
+
+        sector_size = self._overlay_sector_size
+        first = offset // sector_size
+        last = (offset + size - 1) // sector_size
+        if last - first + 1 <= len(self._overlay):
+            sectors = [sector for sector in range(first, last + 1) if sector in self._overlay]
+        else:
+            sectors = sorted(sector for sector in self._overlay if first <= sector <= last)
+        if not sectors:
+            return data
+
+        # staged sectors take precedence over what is on disk
+        buffer = bytearray(data)
+        end = max(len(buffer), min(offset + size, (sectors[-1] + 1) * sector_size) - offset)
+        buffer.extend(bytes(end - len(buffer)))
+        for sector in sectors:
+            sector_start = sector * sector_size
+            start = max(offset, sector_start)
+            stop = min(offset + size, sector_start + sector_size)
+            block = self._overlay[sector]
+            buffer[start - offset:stop - offset] = block[start - sector_start:stop - sector_start]
+        return bytes(buffer)
+
+    def begin(self, sector_size):
+        """Start buffering every write in memory, at sector granularity"""
+        if self._overlay is not None:
+            raise FileAccessError("A transaction is already active")
+        self._overlay = {}
+        self._overlay_sector_size = sector_size
+
+    def stage(self, offset, data):
+        """Buffer a write in the transaction overlay without touching the disk"""
+        sector_size = self._overlay_sector_size
+        view = memoryview(data).cast('B')
+        position = 0
+        while position < len(view):
+            sector, within = divmod(offset + position, sector_size)
+            count = min(sector_size - within, len(view) - position)
+            block = self._overlay.get(sector)
+            if block is None:
+                if count == sector_size:
+                    self._overlay[sector] = bytearray(view[position:position + count])
+                    position += count
+                    continue
+                block = bytearray(self._read_disk(sector * sector_size, sector_size))
+                block.extend(bytes(sector_size - len(block)))
+                self._overlay[sector] = block
+            block[within:within + count] = view[position:position + count]
+            position += count
+
+    def _overlay_runs(self):
+        """Merge staged sectors into sorted runs of consecutive sectors"""
+        sector_size = self._overlay_sector_size
+        runs = []
+        for sector in sorted(self._overlay):
+            if runs and runs[-1][0] + len(runs[-1][1]) == sector * sector_size:
+                runs[-1][1].extend(self._overlay[sector])
+            else:
+                runs.append((sector * sector_size, bytearray(self._overlay[sector])))
+        return runs
+
+    def commit(self, journal_path):
+        """Journal the staged runs, apply them in offset order and sync once"""
+        if self._overlay is None:
+            raise FileAccessError("No transaction is active")
+        runs = self._overlay_runs()
+        if not runs:
+            self._overlay = None
+            return
+
+        journal_runs = [(offset, self._read_disk(offset, len(data)), bytes(data)) for offset, data in runs]
+        write_journal(journal_path, journal_runs)
+
+        self._overlay = None
+        for offset, data in runs:
+            self._write_disk(offset, data)
+        self.sync()
+        discard_journal(journal_path)
+
+    def rollback(self):
+        """Drop every staged write"""
+        self._overlay = None
+        if self.cache is not None:
+            self.cache.clear()
+
+    def sync(self):
+        """Flush and fsync the image"""
+        self.flush()
+        os.fsync(self._file.fileno())
+
+    def _load_blocks(self, first, last):
+        """Return blocks first..last, reading each run of missing blocks once"""
+        cache = self.cache
+        blocks = [cache.get(block) for block in range(first, last + 1)]
+        index = 0
+        while index < len(blocks):
+            if blocks[index] is not None:
+                index += 1
+                continue
+            end = index
+            while end < len(blocks) and blocks[end] is None:
+                end += 1
+            data = self._read(cache.block_offset(first + index), (end - index) * cache.block_size)
+            for position in range(index, end):
+                block = data[(position - index) * cache.block_size:(position - index + 1) * cache.block_size]
+                blocks[position] = block
+                cache.put(first + position, block)
+            index = end
+        return blocks
+
+    def read_view(self, offset, size):
+        """Return a read-only view, served without copying when one cached block covers it"""
+        cache = self.cache
+        if cache is None or not cache.covers(offset, size):
+            return memoryview(self._read(offset, size))
+
+        first = cache.block_of(offset)
+        last = cache.block_of(offset + size - 1)
+        start = offset - cache.block_offset(first)
+        blocks = self._load_blocks(first, last)
+        if len(blocks) == 1:
+            return memoryview(blocks[0])[start:start + size]
+        return memoryview(b''.join(blocks))[start:start + size]
+
+    def read(self, offset, size):
+        """Read size bytes starting at offset"""
+        if self.cache is not None:
+            return bytes(self.read_view(offset, size))
+        return self._read(offset, size)
+
+    def readinto(self, offset, buffer):
+        """Fill buffer with bytes starting at offset and return the count read"""
+        view = memoryview(buffer).cast('B')
+        if self._overlay or (self.cache is not None and self.cache.covers(offset, len(view))):
+            data = self.read_view(offset, len(view))
+            view[:len(data)] = data
+            return len(data)
+        if self._map is not None:
+            count = max(0, min(len(view), len(self._map) - offset))
+            view[:count] = self._map[offset:offset + count]
+            if self.stats is not None:
+                self._count(0, 1, count, 0, 0)
+            return count
+        self._file.seek(offset)
+        count = self._file.readinto(view) or 0
+        if self.stats is not None:
+            self._count(1, 1, count, 0, 0)
+        return count
+
+    def write(self, offset, data):
+        """Write data starting at offset"""
+        if not self.writable:
+            raise FileAccessError("Disk image is mounted read-only")
+        if self.cache is not None:
+            self.cache.invalidate(offset, len(data))
+        if self._overlay is not None:
+            self.stage(offset, data)
+            return
+        self._write_disk(offset, data)
+
+    def _punch_hole(self, offset, size):
+        """Deallocate a range of a sparse image file, returning False when that is not possible"""
+        if _fallocate is None or not self.sparse or self._map is not None or self._overlay is not None:
+            return False
+        self._file.flush()
+        return _fallocate(self._file.fileno(), FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, offset, size) == 0
+
+    def zero_range(self, offset, size):
+        """Zero a byte range, punching a hole in sparse images where the platform allows it"""
+        if not self.writable:
+            raise FileAccessError("Disk image is mounted read-only")
+        if self.cache is not None:
+            self.cache.invalidate(offset, size)
+        if self._punch_hole(offset, size):
+            return
+
+        zeros = bytes(min(size, WRITE_BLOCK_SIZE))
+        end = offset + size
+        while offset < end:
+            count = min(len(zeros), end - offset)
+            self.write(offset, zeros[:count] if count < len(zeros) else zeros)
+            offset += count
+
+    def flush(self):
+        """Push pending writes down to the operating system"""
+        if not self.writable or self._overlay is not None:
+            return
+        if self._map is not None:
+            self._map.flush()
+        else:
+            self._file.flush()
+
+    def close(self):
+        """Flush and release the image handle"""
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
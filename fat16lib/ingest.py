@@ -0,0 +1,105 @@
+import datetime
+import errno
+import os
+from collections import namedtuple
+from .exceptions import *
+from .utils import *
+
+class InsertResult(namedtuple('InsertResult', ['name', 'size', 'error'])):
+    """Outcome of inserting one source in a batch"""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+def is_path(source):
+    return isinstance(source, (str, bytes, os.PathLike))
+
+def split_source(item):
+    """Return the (name, source) pair for a path, a named stream or a (name, source) tuple"""
+    if isinstance(item, tuple):
+        name, source = item
+        return name, source
+    if is_path(item):
+        return os.path.basename(os.fsdecode(item)), item
+    name = getattr(item, 'name', None)
+    if not isinstance(name, str):
+        raise InvalidFileNameError("Streams without a name must be given as (name, stream) pairs")
+    return os.path.basename(name), item
+
+def source_error(source, error):
+    """Turn an OSError raised by a host source into the matching FAT16 error"""
+    if getattr(error, 'errno', None) == errno.ENOENT and is_path(source):
+        return FileNotFoundError(f"Source file not found: {os.fsdecode(source)}")
+    return FileAccessError(f"Could not read source file: {str(error)}")
+
+def source_metadata(source):
+    """Return the FAT attributes and creation time to record for a source"""
+    if is_path(source):
+        try:
+            creation_date = datetime.datetime.fromtimestamp(os.stat(source).st_ctime)
+            return get_attributes(source), creation_date
+        except OSError as e:
+            raise source_error(source, e)
+    return 0, datetime.datetime.now()
+
+def source_size(source):
+    """Return the byte size of a path or seekable stream, or None when unknown"""
+    if is_path(source):
+        try:
+            return os.path.getsize(source)
+        except OSError as e:
+            raise source_error(source, e)
+    try:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END) - position
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def read_source(source):
+    """Read a whole path, stream or iterable of byte chunks into memory"""
+    try:
+        if is_path(source):
+            with open(source, 'rb') as external_file:
+                return external_file.read()
+        if hasattr(source, 'read'):
+            return source.read()
+        if hasattr(source, '__iter__'):
+            return b''.join(source)
+        raise TypeError(f"Unsupported source type: {type(source).__name__}")
+    except IOError as e:
+        raise source_error(source, e)
+
+def iter_source_chunks(source, chunk_size):
+    """Yield a path, binary stream or iterable of byte chunks piece by piece"""
+    try:
+        if is_path(source):
+            with open(source, 'rb') as external_file:
+                yield from iter(lambda: external_file.read(chunk_size), b'')
+        elif hasattr(source, 'read'):
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                if chunk is None:
+                    break
+                yield chunk
+        else:
+            for chunk in source:
+                yield chunk
+    except IOError as e:
+        raise source_error(source, e)
+
+class PlannedInsert:
+    """A batch source whose name is reserved, along with its clusters once its size is known"""
+    __slots__ = ('index', 'directory', 'name', 'source', 'size', 'clusters', 'attributes', 'creation_date')
+
+    def __init__(self, index, directory, name, source, size, clusters, attributes, creation_date):
+        self.index = index
+        self.directory = directory
+        self.name = name
+        self.source = source
+        self.size = size
+        self.clusters = clusters
+        self.attributes = attributes
+        self.creation_date = creation_date
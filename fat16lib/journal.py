@@ -0,0 +1,96 @@
+import os
+import struct
+import zlib
+from .exceptions import *
+
+JOURNAL_SUFFIX = '.journal'
+
+_HEADER = struct.Struct('<8sI')
+_RUN = struct.Struct('<QI')
+_TRAILER = struct.Struct('<8sI')
+
+JOURNAL_MAGIC = b'F16JRNL1'
+COMMIT_MAGIC = b'F16JCMT1'
+
+def journal_path(image_path):
+    """Path of the sidecar journal that belongs to a disk image"""
+    return image_path + JOURNAL_SUFFIX
+
+def _fsync_directory(path):
+    """Make a newly created or removed directory entry durable"""
+    if os.name == 'nt':
+        # Windows has no directory handles to fsync; NTFS journals its metadata itself
+        return
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+def journal_pending(path):
+    """Check whether a committed journal is waiting to be applied"""
+    return os.path.exists(path) and read_journal(path) is not None
+
+def write_journal(path, runs):
+    """Durably record (offset, undo, redo) runs followed by a checksummed commit marker"""
+    if journal_pending(path):
+        # overwriting it would lose the redo data of a transaction that never finished applying
+        raise FileAccessError(f"Journal '{path}' still holds a committed transaction; remount the image to recover it")
+    checksum = 0
+    try:
+        with open(path, 'wb') as journal:
+            def emit(data):
+                nonlocal checksum
+                checksum = zlib.crc32(data, checksum)
+                journal.write(data)
+
+            emit(_HEADER.pack(JOURNAL_MAGIC, len(runs)))
+            for offset, undo, redo in runs:
+                emit(_RUN.pack(offset, len(redo)))
+                emit(undo.ljust(len(redo), b'\x00'))
+                emit(redo)
+            journal.write(_TRAILER.pack(COMMIT_MAGIC, checksum))
+            journal.flush()
+            os.fsync(journal.fileno())
+        # without this the journal's own directory entry may be lost in a crash while the image is half written
+        _fsync_directory(path)
+    except IOError as e:
+        raise FileAccessError(f"Could not write journal: {str(e)}")
+
+def read_journal(path):
+    """Return the (offset, undo, redo) runs of a committed journal, or None if it is incomplete"""
+    try:
+        with open(path, 'rb') as journal:
+            data = journal.read()
+    except IOError as e:
+        raise FileAccessError(f"Could not read journal: {str(e)}")
+
+    try:
+        magic, count = _HEADER.unpack_from(data, 0)
+        if magic != JOURNAL_MAGIC:
+            return None
+        position = _HEADER.size
+        runs = []
+        for _ in range(count):
+            offset, length = _RUN.unpack_from(data, position)
+            position += _RUN.size
+            undo = data[position:position + length]
+            redo = data[position + length:position + 2 * length]
+            if len(redo) != length:
+                return None
+            runs.append((offset, undo, redo))
+            position += 2 * length
+        commit, checksum = _TRAILER.unpack_from(data, position)
+    except struct.error:
+        return None
+
+    if commit != COMMIT_MAGIC or zlib.crc32(data[:position]) != checksum:
+        return None
+    return runs
+
+def discard_journal(path):
+    """Remove a journal once its runs are safely on disk"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,203 @@
+import datetime
+import struct
+import sys
+from array import array
+from random import Random
+from .constants import *
+from .exceptions import *
+from .geometry import Geometry
+from .utils import *
+
+def _sectors_per_fat(total_sectors, bytes_per_sector, sectors_per_cluster, reserved_sectors, number_of_fats, root_sectors):
+    """Smallest FAT that can address every data cluster left over once the FAT itself is placed"""
+    sectors_per_fat = 1
+    while True:
+        data_sectors = total_sectors - reserved_sectors - number_of_fats * sectors_per_fat - root_sectors
+        clusters = max(0, data_sectors // sectors_per_cluster)
+        needed = ((clusters + FIRST_DATA_CLUSTER) * FAT_ENTRY_SIZE + bytes_per_sector - 1) // bytes_per_sector
+        if needed <= sectors_per_fat:
+            return sectors_per_fat
+        sectors_per_fat = needed
+
+def _layout(size, cluster_size, root_entries, sectors_per_fat, bytes_per_sector, number_of_fats, reserved_sectors):
+    """Work out the geometry of a volume, sizing the FAT to fit when sectors_per_fat is None"""
+    sectors_per_cluster = cluster_size // bytes_per_sector
+    if cluster_size % bytes_per_sector or not 1 <= sectors_per_cluster <= 128 or sectors_per_cluster & (sectors_per_cluster - 1):
+        raise ValueError(f"Cluster size must be a power-of-two number of sectors up to 128: {cluster_size}")
+
+    total_sectors = size // bytes_per_sector
+    root_sectors = (root_entries * DIR_ENTRY_SIZE + bytes_per_sector - 1) // bytes_per_sector
+    if sectors_per_fat is None:
+        sectors_per_fat = _sectors_per_fat(total_sectors, bytes_per_sector, sectors_per_cluster,
+                                           reserved_sectors, number_of_fats, root_sectors)
+    if not 0 < sectors_per_fat <= 0xFFFF:
+        raise ValueError(f"Invalid FAT size: {sectors_per_fat} sectors")
+
+    geometry = Geometry(bytes_per_sector, sectors_per_cluster, reserved_sectors, number_of_fats,
+                        root_entries, sectors_per_fat, total_sectors)
+    if geometry.first_data_sector >= total_sectors:
+        raise ValueError(f"Image of {size} bytes has no room for a data region")
+    return geometry
+
+def format_image(image_path, size, cluster_size=None, root_entries=512, sectors_per_fat=None,
+                 bytes_per_sector=512, number_of_fats=2, reserved_sectors=1):
+    """Create an empty FAT16 volume of size bytes and return its geometry
+
+    Without a cluster_size the smallest one that keeps the cluster count
+    within FAT16 limits is used. Layouts with fewer than 4085 or more than
+    65524 clusters are rejected, since FAT drivers would read them as FAT12
+    or FAT32. The image is created sparse, so only the boot sector, the FATs
+    and the root directory take space on the host until files are written.
+    """
+    if bytes_per_sector < BOOT_SECTOR_SIZE or bytes_per_sector & (bytes_per_sector - 1):
+        raise ValueError(f"Invalid sector size: {bytes_per_sector}")
+    if not 0 < root_entries <= 0xFFFF or not 0 < number_of_fats <= 0xFF or reserved_sectors < 1:
+        raise ValueError("Invalid root entry count, FAT count or reserved sector count")
+
+    layout = (root_entries, sectors_per_fat, bytes_per_sector, number_of_fats, reserved_sectors)
+    if cluster_size is None:
+        for sectors_per_cluster in (1, 2, 4, 8, 16, 32, 64, 128):
+            geometry = _layout(size, sectors_per_cluster * bytes_per_sector, *layout)
+            if geometry.data_clusters <= MAX_CLUSTERS:
+                break
+    else:
+        geometry = _layout(size, cluster_size, *layout)
+
+    if geometry.data_clusters < MIN_CLUSTERS:
+        raise ValueError(f"{geometry.data_clusters} clusters are too few for FAT16 (at least {MIN_CLUSTERS}); "
+                         f"use a smaller cluster size or a larger image")
+    if geometry.data_clusters > MAX_CLUSTERS:
+        raise ValueError(f"{geometry.data_clusters} clusters exceed the FAT16 limit of {MAX_CLUSTERS}; "
+                         f"use a larger cluster size or a smaller image")
+
+    sectors_per_cluster = geometry.sectors_per_cluster
+    sectors_per_fat = geometry.sectors_per_fat
+    total_sectors = geometry.total_sectors
+
+    boot_sector = bytearray(bytes_per_sector)
+    boot_sector[0:11] = b'\xEB\x3C\x90FAT16LIB'
+    struct.pack_into('<H', boot_sector, BYTES_PER_SECTOR_OFFSET, bytes_per_sector)
+    struct.pack_into('<B', boot_sector, SECTORS_PER_CLUSTER_OFFSET, sectors_per_cluster)
+    struct.pack_into('<H', boot_sector, RESERVED_SECTORS_OFFSET, reserved_sectors)
+    struct.pack_into('<B', boot_sector, NUMBER_OF_FATS_OFFSET, number_of_fats)
+    struct.pack_into('<H', boot_sector, ROOT_DIR_ENTRIES_OFFSET, root_entries)
+    struct.pack_into('<B', boot_sector, MEDIA_DESCRIPTOR_OFFSET, MEDIA_FIXED_DISK)
+    struct.pack_into('<H', boot_sector, SECTORS_PER_FAT_OFFSET, sectors_per_fat)
+    struct.pack_into('<HH', boot_sector, SECTORS_PER_TRACK_OFFSET, 63, 255)
+    if total_sectors <= 0xFFFF:
+        struct.pack_into('<H', boot_sector, TOTAL_SECTORS_16_OFFSET, total_sectors)
+    else:
+        struct.pack_into('<I', boot_sector, TOTAL_SECTORS_32_OFFSET, total_sectors)
+    boot_sector[EXTENDED_BOOT_SIGNATURE_OFFSET] = 0x29
+    boot_sector[VOLUME_LABEL_OFFSET:VOLUME_LABEL_OFFSET + 11] = b'NO NAME    '
+    boot_sector[FILE_SYSTEM_TYPE_OFFSET:FILE_SYSTEM_TYPE_OFFSET + 8] = b'FAT16   '
+    boot_sector[BOOT_SIGNATURE_OFFSET:BOOT_SIGNATURE_OFFSET + 2] = BOOT_SIGNATURE
+
+    fat = _empty_fat(geometry)
+
+    try:
+        with open(image_path, 'wb') as image:
+            image.truncate(total_sectors * bytes_per_sector)
+            image.write(boot_sector)
+            _write_fat(image, geometry, fat)
+    except IOError as e:
+        raise FileAccessError(f"Could not create disk image: {str(e)}")
+    return geometry
+
+def _empty_fat(geometry):
+    """FAT entries of an empty volume, with the two reserved entries filled in"""
+    fat = array('H', bytes(geometry.fat_size))
+    fat[0] = 0xFF00 | MEDIA_FIXED_DISK
+    fat[1] = END_OF_CLUSTER
+    return fat
+
+def _write_fat(image, geometry, fat):
+    """Write the FAT entries to every FAT copy"""
+    if sys.byteorder == 'big':
+        fat = array('H', fat)
+        fat.byteswap()
+    data = fat.tobytes()
+    for index in range(geometry.number_of_fats):
+        image.seek(geometry.fat_copy_start(index))
+        image.write(data)
+
+def _size_picker(file_size):
+    """Turn an int, a (low, high) range or a callable taking a Random into a size function"""
+    if callable(file_size):
+        return file_size
+    if isinstance(file_size, tuple):
+        low, high = file_size
+        return lambda rng: rng.randint(low, high)
+    return lambda rng: file_size
+
+def _file_content(index, size):
+    """Deterministic filler content that differs from file to file"""
+    pattern = bytes((index + i) & 0xFF for i in range(256))
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+def build_image(image_path, size, file_count=0, file_size=4096, fragmentation=0.0, seed=0, **format_options):
+    """Format an image and fill its root directory with synthetic files, returning the geometry
+
+    file_size is a byte count, a (low, high) range drawn uniformly or a
+    callable that takes a random.Random and returns a size. fragmentation is
+    the probability, from 0.0 to 1.0, that a file breaks to a new extent at
+    each cluster boundary. The same seed always builds the same image.
+    """
+    if not 0.0 <= fragmentation <= 1.0:
+        raise ValueError(f"Fragmentation must be between 0.0 and 1.0: {fragmentation}")
+
+    geometry = format_image(image_path, size, **format_options)
+    if file_count > geometry.root_dir_entries:
+        raise ValueError(f"{file_count} files do not fit in {geometry.root_dir_entries} root directory entries")
+
+    rng = Random(seed)
+    pick_size = _size_picker(file_size)
+    cluster_size = geometry.cluster_size
+    limit = FIRST_DATA_CLUSTER + geometry.total_clusters
+    creation_date = datetime.datetime(2020, 1, 1)
+
+    fat = _empty_fat(geometry)
+    root = bytearray(geometry.root_dir_size)
+    cluster = FIRST_DATA_CLUSTER
+
+    try:
+        with open(image_path, 'r+b') as image:
+            for index in range(file_count):
+                file_name = f"F{index:07d}.BIN"
+                content = _file_content(index, pick_size(rng))
+
+                clusters = []
+                for _ in range((len(content) + cluster_size - 1) // cluster_size):
+                    if clusters and rng.random() < fragmentation:
+                        # leaving a small hole makes the file continue in a new extent
+                        cluster += rng.randint(1, 4)
+                    if cluster >= limit:
+                        raise NotEnoughSpaceError(f"Image is full after {index} files")
+                    clusters.append(cluster)
+                    cluster += 1
+
+                for i in range(len(clusters) - 1):
+                    fat[clusters[i]] = clusters[i + 1]
+                if clusters:
+                    fat[clusters[-1]] = END_OF_CLUSTER
+
+                position = 0
+                for start, count in group_runs(clusters):
+                    image.seek(geometry.cluster_offset(start))
+                    image.write(content[position:position + count * cluster_size])
+                    position += count * cluster_size
+
+                entry = bytearray(DIR_ENTRY_SIZE)
+                entry[0:FILE_NAME_SIZE + FILE_EXT_SIZE] = encode_entry_name(file_name)
+                entry[11] = ARCHIVE
+                entry[22:24] = encode_time(creation_date)
+                entry[24:26] = encode_date(creation_date)
+                struct.pack_into('<HI', entry, 26, clusters[0] if clusters else 0, len(content))
+                root[index * DIR_ENTRY_SIZE:(index + 1) * DIR_ENTRY_SIZE] = entry
+
+            _write_fat(image, geometry, fat)
+            image.seek(geometry.root_dir_start)
+            image.write(root)
+    except IOError as e:
+        raise FileAccessError(f"Could not write disk image: {str(e)}")
+    return geometry
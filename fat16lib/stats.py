@@ -0,0 +1,92 @@
+import functools
+import time
+from bisect import bisect_left
+
+# upper bounds in seconds of the latency buckets; one more bucket catches anything slower
+LATENCY_BOUNDS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+class LatencyHistogram:
+    """Operation latencies counted in fixed log-spaced buckets"""
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self):
+        return {'count': self.count, 'total': self.total, 'max': self.max, 'mean': self.mean,
+                'buckets': dict(zip(LATENCY_BOUNDS + (float('inf'),), self.counts))}
+
+class IOStats:
+    """I/O counters and per-operation latency histograms for one FAT16 instance
+
+    Hooks are called as hook(operation, seconds, error) after every timed
+    operation, with error set to the exception it raised or None.
+    """
+    COUNTERS = ('opens', 'seeks', 'read_calls', 'write_calls', 'bytes_read', 'bytes_written',
+                'fat_entries', 'dir_entries')
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.reset()
+
+    def reset(self):
+        """Zero every counter and histogram"""
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.latencies = {}
+
+    def record(self, operation, seconds, error=None):
+        """Add one operation latency to its histogram and notify the hooks"""
+        histogram = self.latencies.get(operation)
+        if histogram is None:
+            histogram = self.latencies[operation] = LatencyHistogram()
+        histogram.add(seconds)
+        for hook in self.hooks:
+            hook(operation, seconds, error)
+
+    def snapshot(self):
+        """Return the counters and histograms as plain dicts, ready for export"""
+        snapshot = {name: getattr(self, name) for name in self.COUNTERS}
+        snapshot['latencies'] = {operation: histogram.as_dict() for operation, histogram in self.latencies.items()}
+        return snapshot
+
+def timed(method):
+    """Record a FAT16 method's latency in self.stats, doing nothing else while stats are disabled
+
+    Only the outermost timed call is recorded, so an operation that mounts,
+    flushes or delegates to another public method counts once.
+    """
+    operation = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self.stats
+        if stats is None or self._timing:
+            return method(self, *args, **kwargs)
+        error = None
+        self._timing = True
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._timing = False
+            stats.record(operation, time.perf_counter() - start, error)
+
+    return wrapper
@@ -0,0 +1,91 @@
+import io
+from bisect import bisect_right
+from .exceptions import *
+
+class FileReader(io.RawIOBase):
+    """Seekable read-only stream that serves a file one extent at a time"""
+
+    def __init__(self, image, geometry, extents, size, name=None, on_close=None):
+        """Map (start_cluster, count) extents onto file offsets"""
+        super().__init__()
+        self.name = name
+        self._image = image
+        self._on_close = on_close
+        self._position = 0
+        self._starts = []
+        self._offsets = []
+        self._lengths = []
+
+        position = 0
+        for start_cluster, count in extents:
+            if position >= size:
+                break
+            length = min(count * geometry.cluster_size, size - position)
+            self._starts.append(position)
+            self._offsets.append(geometry.cluster_offset(start_cluster))
+            self._lengths.append(length)
+            position += length
+
+        # a chain shorter than the recorded size ends the file early
+        self.size = position
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._checkClosed()
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence value: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        """Fill buffer from as many extents as needed, one read per extent"""
+        self._checkClosed()
+        view = memoryview(buffer).cast('B')
+        total = 0
+
+        try:
+            while total < len(view) and self._position < self.size:
+                index = bisect_right(self._starts, self._position) - 1
+                within = self._position - self._starts[index]
+                length = min(self._lengths[index] - within, len(view) - total)
+
+                count = self._image.readinto(self._offsets[index] + within, view[total:total + length])
+                if not count:
+                    break
+                total += count
+                self._position += count
+        except IOError as e:
+            raise FileAccessError(f"Error reading file: {str(e)}")
+
+        return total
+
+    def readall(self):
+        """Read everything from the current position to the end of the file"""
+        buffer = bytearray(max(0, self.size - self._position))
+        count = self.readinto(buffer)
+        del buffer[count:]
+        return bytes(buffer)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        if self._on_close is not None:
+            self._on_close()
@@ -2,6 +2,7 @@ import struct
 import os
 import stat
 from .constants import *
+from .exceptions import *
 
 def decode_time(time_bytes):
     """Decode FAT16 time format"""
@@ -34,7 +35,7 @@ def get_attributes(external_file):
     """Get file attributes from external file"""
     attributes = 0
     file_stats = os.stat(external_file)
-    file_attributes = file_stats.st_file_attributes
+    file_attributes = getattr(file_stats, 'st_file_attributes', 0)
 
     if file_attributes & stat.FILE_ATTRIBUTE_READONLY:
         attributes |= READ_ONLY
@@ -54,4 +55,55 @@ def split_filename(filename):
     else:
         name = filename[:FILE_NAME_SIZE].upper()
         ext = ''
-    return name, ext
\ No newline at end of file
+    return name, ext
+
+def normalize_name(filename):
+    """Normalize a file name for case-insensitive 8.3 lookups"""
+    return filename.strip().upper()
+
+def entry_key(filename):
+    """Return the upper-cased 11-byte name field a file name maps to, or None if it is not 8.3"""
+    name = normalize_name(filename)
+    if name in ('.', '..'):
+        return name.ljust(FILE_NAME_SIZE + FILE_EXT_SIZE).encode('ascii')
+    name_part, _, ext_part = name.partition('.')
+    if not name_part or len(name_part) > FILE_NAME_SIZE or len(ext_part) > FILE_EXT_SIZE:
+        return None
+    try:
+        return name_part.ljust(FILE_NAME_SIZE).encode('latin-1') + ext_part.ljust(FILE_EXT_SIZE).encode('latin-1')
+    except UnicodeEncodeError:
+        return None
+
+def format_entry_name(entry):
+    """Build the NAME.EXT string stored in a raw directory entry"""
+    return join_entry_name(bytes(entry[0:FILE_NAME_SIZE]), bytes(entry[FILE_NAME_SIZE:FILE_NAME_SIZE+FILE_EXT_SIZE]))
+
+def join_entry_name(file_name, file_extension):
+    """Join raw 8.3 name and extension fields into a NAME.EXT string"""
+    file_name = file_name.strip()
+    file_extension = file_extension.strip()
+    return (file_name + b'.' + file_extension if file_extension else file_name).decode('latin-1')
+
+def encode_entry_name(filename):
+    """Encode a file name into the 11-byte padded 8.3 form"""
+    name_part, ext_part = split_filename(filename)
+    if not name_part:
+        raise InvalidFileNameError("Invalid file name")
+    try:
+        return name_part.ljust(FILE_NAME_SIZE).encode('ascii') + ext_part.ljust(FILE_EXT_SIZE).encode('ascii')
+    except UnicodeEncodeError:
+        raise InvalidFileNameError(f"File name '{filename}' is not ASCII")
+
+def split_path(path):
+    """Split a slash or backslash separated path into its components"""
+    return [part for part in path.replace('\\', '/').split('/') if part]
+
+def group_runs(values):
+    """Group integers into (start, count) runs of consecutive values, in sorted order"""
+    runs = []
+    for value in sorted(values):
+        if runs and runs[-1][0] + runs[-1][1] == value:
+            runs[-1][1] += 1
+        elif not runs or runs[-1][0] + runs[-1][1] < value:
+            runs.append([value, 1])
+    return [tuple(run) for run in runs]
@@ -0,0 +1,32 @@
+import struct
+import pytest
+from fat16lib.constants import ARCHIVE, DIR_ENTRY_SIZE, DIRECTORY, END_OF_CLUSTER
+from fat16lib.utils import encode_entry_name
+
+def _raw_entry(name, attributes, first_cluster=0, size=0):
+    entry = bytearray(DIR_ENTRY_SIZE)
+    entry[0:11] = name if isinstance(name, bytes) else encode_entry_name(name)
+    entry[11] = attributes
+    struct.pack_into('<HI', entry, 26, first_cluster, size)
+    return entry
+
+@pytest.fixture
+def make_directory():
+    """Return a helper that writes a one-cluster subdirectory holding file_count empty files
+
+    The entry goes into the given slot of the root, or of the subdirectory at
+    parent_cluster when one is given.
+    """
+    def make(image_path, geometry, slot, name, cluster, parent_cluster=0, file_count=0):
+        parent_offset = geometry.cluster_offset(parent_cluster) if parent_cluster else geometry.root_dir_start
+        entries = [_raw_entry(b'.          ', DIRECTORY, cluster), _raw_entry(b'..         ', DIRECTORY, parent_cluster)]
+        entries += [_raw_entry(f'E{index:07d}.BIN', ARCHIVE) for index in range(file_count)]
+        with open(image_path, 'r+b') as image:
+            image.seek(parent_offset + slot * DIR_ENTRY_SIZE)
+            image.write(_raw_entry(name, DIRECTORY, cluster))
+            image.seek(geometry.cluster_offset(cluster))
+            image.write(b''.join(entries))
+            for index in range(geometry.number_of_fats):
+                image.seek(geometry.fat_copy_start(index) + cluster * 2)
+                image.write(struct.pack('<H', END_OF_CLUSTER))
+    return make
@@ -0,0 +1,73 @@
+import io
+import pytest
+from fat16lib import BEST_FIT, FAT16, FIRST_FIT, NEXT_FIT, NotEnoughSpaceError, build_image
+from fat16lib.allocator import ClusterAllocator
+from fat16lib.constants import CLUSTER_FREE, END_OF_CLUSTER, FIRST_DATA_CLUSTER
+
+def _allocator(layout, policy=FIRST_FIT):
+    """Allocator over a FAT whose data clusters are free ('.') or used ('#') as drawn in layout"""
+    fat = [END_OF_CLUSTER] * FIRST_DATA_CLUSTER
+    fat += [CLUSTER_FREE if mark == '.' else END_OF_CLUSTER for mark in layout]
+    return ClusterAllocator(fat, len(layout), policy)
+
+# free runs of 3 at cluster 2, 1 at cluster 6 and 2 at cluster 8
+LAYOUT = '...#.#..#'
+
+def test_first_fit_takes_the_lowest_free_clusters():
+    allocator = _allocator(LAYOUT)
+    assert allocator.allocate(2) == [2, 3]
+    assert allocator.allocate(3) == [4, 6, 8]
+    assert allocator.free_count == 1
+
+def test_next_fit_continues_after_the_previous_allocation():
+    allocator = _allocator(LAYOUT, NEXT_FIT)
+    assert allocator.allocate(1) == [2]
+    assert allocator.allocate(1) == [3]
+    allocator.release([2])
+    assert allocator.allocate(2) == [4, 6]
+    # the cursor wraps around to the clusters freed behind it
+    assert allocator.allocate(2) == [8, 9]
+    assert allocator.allocate(1) == [2]
+
+def test_best_fit_picks_the_smallest_hole_that_fits():
+    allocator = _allocator(LAYOUT, BEST_FIT)
+    assert allocator.allocate(1) == [6]
+    assert allocator.allocate(2) == [8, 9]
+    assert allocator.allocate(2) == [2, 3]
+
+def test_best_fit_spreads_over_the_largest_holes_when_nothing_fits():
+    allocator = _allocator(LAYOUT, BEST_FIT)
+    assert allocator.allocate(5) == [2, 3, 4, 8, 9]
+
+def test_allocation_that_does_not_fit_reserves_nothing():
+    allocator = _allocator(LAYOUT)
+    with pytest.raises(NotEnoughSpaceError):
+        allocator.allocate(7)
+    assert allocator.free_count == 6
+    assert allocator.free_extents() == [(2, 3), (6, 1), (8, 2)]
+
+def test_extent_allocation_needs_one_contiguous_run():
+    allocator = _allocator(LAYOUT)
+    assert allocator.allocate_extent(4) is None
+    assert allocator.allocate_extent(2) == [8, 9]
+    assert allocator.largest_free_extent() == (2, 3)
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        _allocator(LAYOUT, 'worst-fit')
+
+# files are 8 clusters each from cluster 2, so deleting two leaves holes at 10 and 34
+@pytest.mark.parametrize('policy, first_cluster', [(FIRST_FIT, 10), (NEXT_FIT, 10), (BEST_FIT, 50)])
+def test_policies_place_a_new_file_on_a_mounted_volume(tmp_path, policy, first_cluster):
+    image_path = str(tmp_path / 'disk.img')
+    build_image(image_path, 16 * 1024 * 1024, file_count=6, file_size=4096)
+
+    with FAT16.open(image_path, writable=True, allocation_policy=policy) as fat:
+        fat.delete_many(['F0000001.BIN', 'F0000004.BIN'])
+        fat.write_file('NEW.BIN', io.BytesIO(bytes(8192)), size=8192)
+        assert fat.check().clean
+
+    with FAT16.open(image_path) as fat:
+        entries = {entry.name: entry for entry in fat.scandir()}
+        assert entries['NEW.BIN'].first_cluster == first_cluster
+        assert entries['NEW.BIN'].size == 8192
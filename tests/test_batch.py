@@ -0,0 +1,34 @@
+import os
+from fat16lib import JOB_CHECK, JOB_EXTRACT_ALL, JOB_LIST, build_image, run_batch
+
+def test_extract_all_keeps_images_with_the_same_name_apart(tmp_path):
+    image_paths = []
+    for folder, size in (('a', 1000), ('b', 2000)):
+        os.mkdir(tmp_path / folder)
+        image_path = str(tmp_path / folder / 'disk.img')
+        build_image(image_path, 16 * 1024 * 1024, file_count=2, file_size=size)
+        image_paths.append(image_path)
+    output_dir = tmp_path / 'out'
+
+    results = {result.image_path: result for result in run_batch(image_paths, JOB_EXTRACT_ALL, str(output_dir), max_workers=2)}
+    assert all(result.ok for result in results.values())
+
+    targets = os.listdir(output_dir)
+    assert len(targets) == 2
+    assert all(target.startswith('disk.img-') for target in targets)
+    sizes = sorted(os.path.getsize(output_dir / target / 'F0000000.BIN') for target in targets)
+    assert sizes == [1000, 2000]
+
+def test_batch_reports_a_broken_image_without_stopping(tmp_path):
+    good = str(tmp_path / 'good.img')
+    build_image(good, 16 * 1024 * 1024, file_count=3, file_size=500)
+    broken = str(tmp_path / 'broken.img')
+    with open(broken, 'wb') as image:
+        image.write(bytes(4096))
+
+    results = {result.image_path: result for result in run_batch([good, broken], JOB_LIST, max_workers=2)}
+    assert results[good].value == [('F0000000.BIN', 500), ('F0000001.BIN', 500), ('F0000002.BIN', 500)]
+    assert not results[broken].ok
+
+    [result] = run_batch([good], JOB_CHECK, max_workers=1)
+    assert result.value.clean
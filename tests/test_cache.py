@@ -0,0 +1,52 @@
+import io
+import pytest
+from fat16lib import FAT16, build_image
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    build_image(path, 16 * 1024 * 1024, file_count=3, file_size=6000, fragmentation=0.3)
+    return path
+
+def test_repeated_reads_hit_the_cache(image_path):
+    with FAT16.open(image_path, cache_size=256 * 1024) as fat:
+        first = fat.read_file('F0000001.BIN')
+        misses = fat.cache_info().misses
+        assert fat.read_file('F0000001.BIN') == first
+        info = fat.cache_info()
+        assert info.misses == misses
+        assert info.hits > 0
+        assert 0 < info.size <= info.budget
+
+def test_writes_replace_cached_clusters(image_path):
+    with FAT16.open(image_path, writable=True, cache_size=256 * 1024) as fat:
+        fat.read_file('F0000000.BIN')
+        fat.delete_file('F0000000.BIN')
+        # first-fit reuses the clusters that are still cached from the read above
+        fat.write_file('NEW.BIN', io.BytesIO(b'fresh' * 1200))
+        assert fat.read_file('NEW.BIN') == 'fresh' * 1200
+
+def test_rolled_back_transaction_leaves_no_staged_data_in_the_cache(image_path):
+    with FAT16.open(image_path, writable=True, cache_size=256 * 1024) as fat:
+        original = fat.read_file('F0000002.BIN')
+        with pytest.raises(RuntimeError):
+            with fat.transaction():
+                fat.delete_file('F0000002.BIN')
+                fat.write_file('TEMP.BIN', io.BytesIO(b't' * 6000))
+                assert fat.read_file('TEMP.BIN') == 't' * 6000
+                raise RuntimeError('abort')
+        assert fat.read_file('F0000002.BIN') == original
+        assert 'TEMP.BIN' not in dict(fat.list_files())
+
+def test_unmounting_drops_cached_metadata(image_path):
+    fat = FAT16.open(image_path, writable=True)
+    assert len(fat.list_files()) == 3
+    fat.close()
+
+    # another writer changes the image while nothing is mounted
+    other = FAT16(image_path)
+    other.delete_file('F0000000.BIN')
+
+    fat.mount()
+    assert [name for name, size in fat.list_files()] == ['F0000001.BIN', 'F0000002.BIN']
+    fat.close()
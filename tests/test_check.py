@@ -0,0 +1,40 @@
+import struct
+import pytest
+from fat16lib import FAT16, InvalidDiskImageError, build_image
+
+def _cross_link(image_path, geometry, cluster, target):
+    """Point a FAT entry at another cluster in every FAT copy"""
+    with open(image_path, 'r+b') as image:
+        for index in range(geometry.number_of_fats):
+            image.seek(geometry.fat_copy_start(index) + cluster * 2)
+            image.write(struct.pack('<H', target))
+
+def test_repair_keeps_file_whose_chain_a_neighbour_runs_into(tmp_path):
+    image_path = str(tmp_path / 'disk.img')
+    sizes = iter([4285, 8784])
+    geometry = build_image(image_path, 16 * 1024 * 1024, file_count=2, file_size=lambda rng: next(sizes))
+
+    with FAT16.open(image_path) as fat:
+        clusters = {entry.name: (entry.first_cluster, entry.size) for entry in fat.scandir()}
+    first_cluster, size = clusters['F0000000.BIN']
+    last_cluster = first_cluster + (size + geometry.cluster_size - 1) // geometry.cluster_size - 1
+    _cross_link(image_path, geometry, last_cluster, clusters['F0000001.BIN'][0])
+
+    with FAT16.open(image_path, writable=True) as fat:
+        report = fat.check(repair=True)
+        assert report.repaired
+        assert not report.cross_linked
+        assert [path for path, size, chain_bytes in report.size_mismatches] == ['F0000000.BIN']
+
+    with FAT16.open(image_path) as fat:
+        assert dict(fat.list_files()) == {'F0000000.BIN': 4285, 'F0000001.BIN': 8784}
+        assert fat.check().clean
+        assert len(fat.read_file('F0000001.BIN')) == 8784
+
+@pytest.mark.parametrize('content', [b'x' * 100, b'x' * 4096, bytes(510) + b'\x55\xAA'])
+def test_check_rejects_images_that_are_not_fat16(tmp_path, content):
+    image_path = str(tmp_path / 'junk.img')
+    with open(image_path, 'wb') as image:
+        image.write(content)
+    with pytest.raises(InvalidDiskImageError):
+        FAT16(image_path).check()
@@ -0,0 +1,48 @@
+import pytest
+from fat16lib import FAT16, build_image
+from fat16lib.image import DiskImage
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    build_image(path, 16 * 1024 * 1024, file_count=8, file_size=(8000, 40000), fragmentation=0.5)
+    return path
+
+def test_defragment_makes_files_contiguous_and_keeps_contents(image_path):
+    with FAT16.open(image_path) as fat:
+        contents = {name: fat.read_file(name) for name, size in fat.list_files()}
+
+    with FAT16.open(image_path, writable=True) as fat:
+        report = fat.defragment()
+        assert report.complete
+        assert report.files_moved > 0
+        assert report.fragmentation_after == 0.0 < report.fragmentation_before
+        assert fat.check().clean
+
+    with FAT16.open(image_path) as fat:
+        assert {name: fat.read_file(name) for name, size in fat.list_files()} == contents
+
+def test_defragment_syncs_copied_data_before_committing(image_path, monkeypatch):
+    events = []
+    sync, commit = DiskImage.sync, DiskImage.commit
+
+    def recording_sync(self):
+        events.append('sync')
+        return sync(self)
+
+    def recording_commit(self, path):
+        events.append('commit')
+        return commit(self, path)
+
+    monkeypatch.setattr(DiskImage, 'sync', recording_sync)
+    monkeypatch.setattr(DiskImage, 'commit', recording_commit)
+    with FAT16.open(image_path, writable=True) as fat:
+        fat.defragment(max_bytes=1)
+
+    assert events.index('sync') < events.index('commit')
+
+def test_defragment_stops_at_byte_budget(image_path):
+    with FAT16.open(image_path, writable=True) as fat:
+        report = fat.defragment(max_bytes=1)
+        assert report.files_moved == 1
+        assert not report.complete
@@ -0,0 +1,60 @@
+import pytest
+from fat16lib import FAT16, FileAccessError, ZERO_DEFERRED, ZERO_IMMEDIATE, ZERO_NEVER, build_image
+
+@pytest.fixture
+def image(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    geometry = build_image(path, 16 * 1024 * 1024, file_count=4, file_size=3000)
+    with FAT16.open(path) as fat:
+        clusters = {entry.name: entry.first_cluster for entry in fat.scandir()}
+    return path, geometry, clusters
+
+def _first_cluster_data(image_path, geometry, cluster):
+    with open(image_path, 'rb') as image:
+        image.seek(geometry.cluster_offset(cluster))
+        return image.read(geometry.cluster_size)
+
+def test_delete_many_reports_which_names_existed(image):
+    image_path, geometry, clusters = image
+    with FAT16.open(image_path, writable=True) as fat:
+        free = fat.free_space()
+        assert fat.delete_many(['F0000000.BIN', 'MISSING.BIN', 'f0000002.bin', 'F0000000.BIN']) == [True, False, True, False]
+        assert [name for name, size in fat.list_files()] == ['F0000001.BIN', 'F0000003.BIN']
+        assert fat.free_space() == free + 2 * 6 * geometry.cluster_size
+        assert fat.check().clean
+
+@pytest.mark.parametrize('policy, zeroed', [(ZERO_IMMEDIATE, True), (ZERO_NEVER, False), (ZERO_DEFERRED, False)])
+def test_zeroing_policy_decides_when_freed_data_is_wiped(image, policy, zeroed):
+    image_path, geometry, clusters = image
+    FAT16(image_path).delete_many(['F0000001.BIN'], zero_data=policy)
+    data = _first_cluster_data(image_path, geometry, clusters['F0000001.BIN'])
+    assert (data == bytes(geometry.cluster_size)) == zeroed
+
+def test_scrub_zeroes_deferred_clusters_that_are_still_free(image):
+    image_path, geometry, clusters = image
+    with FAT16.open(image_path, writable=True) as fat:
+        fat.delete_many(['F0000001.BIN', 'F0000002.BIN'], zero_data=ZERO_DEFERRED)
+        # first-fit hands F0000001's clusters straight to the new file, so they must survive the scrub
+        fat.write_file('NEW.BIN', [b'n' * 3000])
+        assert fat.scrub() == 6 * geometry.cluster_size
+        assert fat.scrub() == 0
+        assert fat.read_file('NEW.BIN') == 'n' * 3000
+
+    assert _first_cluster_data(image_path, geometry, clusters['F0000002.BIN']) == bytes(geometry.cluster_size)
+    assert _first_cluster_data(image_path, geometry, clusters['F0000001.BIN'])[:3] == b'nnn'
+
+def test_unknown_zeroing_policy_is_rejected(image):
+    image_path, geometry, clusters = image
+    with pytest.raises(ValueError):
+        FAT16(image_path).delete_many(['F0000000.BIN'], zero_data='shred')
+
+def test_non_empty_directory_is_not_deleted(image, make_directory):
+    image_path, geometry, clusters = image
+    make_directory(image_path, geometry, 4, 'SUB', geometry.total_clusters, file_count=1)
+    fat = FAT16(image_path)
+    with pytest.raises(FileAccessError):
+        fat.delete_many(['F0000000.BIN', 'SUB'])
+    assert [name for name, size in fat.list_files()][0] == 'F0000000.BIN'
+    assert fat.delete_file('SUB/E0000000.BIN')
+    assert fat.delete_many(['SUB']) == [True]
+    assert fat.check().clean
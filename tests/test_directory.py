@@ -0,0 +1,83 @@
+import io
+import pytest
+from fat16lib import FAT16, FileNotFoundError, build_image
+
+@pytest.fixture
+def image(tmp_path, make_directory):
+    """Root files F0000000-F0000003, SUB with two empty files and SUB/DEEP inside it"""
+    path = str(tmp_path / 'disk.img')
+    geometry = build_image(path, 16 * 1024 * 1024, file_count=4, file_size=700)
+    sub = geometry.total_clusters
+    make_directory(path, geometry, 4, 'SUB', sub, file_count=2)
+    make_directory(path, geometry, 4, 'DEEP', sub + 1, parent_cluster=sub)
+    return path, geometry
+
+def test_walk_lists_the_tree_top_down(image):
+    image_path, geometry = image
+    with FAT16.open(image_path) as fat:
+        assert list(fat.walk()) == [
+            ('', ['SUB'], ['F0000000.BIN', 'F0000001.BIN', 'F0000002.BIN', 'F0000003.BIN']),
+            ('SUB', ['DEEP'], ['E0000000.BIN', 'E0000001.BIN']),
+            ('SUB/DEEP', [], []),
+        ]
+
+def test_walk_skips_pruned_directories(image):
+    image_path, geometry = image
+    walked = []
+    for dirpath, dirnames, filenames in FAT16(image_path).walk():
+        walked.append(dirpath)
+        dirnames.clear()
+    assert walked == ['']
+
+def test_unmounted_scandir_allows_writes_while_iterating(image):
+    image_path, geometry = image
+    fat = FAT16(image_path)
+    seen = []
+    for entry in fat.scandir():
+        seen.append(entry.name)
+        if not entry.is_directory:
+            fat.delete_file(entry.name)
+
+    assert seen == ['F0000000.BIN', 'F0000001.BIN', 'F0000002.BIN', 'F0000003.BIN', 'SUB']
+    assert fat.list_files() == [('SUB', 0)]
+    assert not fat.mounted
+
+def test_unmounted_walk_allows_writes_between_steps(image):
+    image_path, geometry = image
+    fat = FAT16(image_path)
+    for dirpath, dirnames, filenames in fat.walk():
+        fat.write_file(f"{dirpath}/NEW.TXT" if dirpath else 'NEW.TXT', io.BytesIO(dirpath.encode() or b'root'))
+
+    assert fat.read_file('NEW.TXT') == 'root'
+    assert fat.read_file('SUB/NEW.TXT') == 'SUB'
+    assert fat.read_file('SUB/DEEP/NEW.TXT') == 'SUB/DEEP'
+    assert fat.check().clean
+
+@pytest.mark.parametrize('path', ['SUB/E0000001.BIN', 'sub/e0000001.bin', '/SUB/E0000001.BIN', 'SUB\\E0000001.BIN'])
+def test_paths_resolve_case_insensitively_with_either_separator(image, path):
+    image_path, geometry = image
+    with FAT16.open(image_path) as fat:
+        assert fat.read_file(path) == ''
+        assert fat.get_file_attributes(path)['file_name'] == path
+
+def test_nested_paths_resolve_for_writes_and_listings(image):
+    image_path, geometry = image
+    with FAT16.open(image_path, writable=True) as fat:
+        fat.write_file('sub/deep/note.txt', io.BytesIO(b'deep'))
+        assert fat.list_dir('SUB/DEEP') == [('NOTE.TXT', 4)]
+        fat.rename_file('SUB/DEEP/NOTE.TXT', 'MEMO.TXT')
+        assert fat.read_file('Sub\\Deep\\Memo.txt') == 'deep'
+
+@pytest.mark.parametrize('path', ['NOPE/E0000000.BIN', 'F0000000.BIN/X.BIN', 'SUB/NOPE.BIN'])
+def test_missing_path_components_are_not_found(image, path):
+    image_path, geometry = image
+    with pytest.raises(FileNotFoundError):
+        FAT16(image_path).read_file(path)
+
+def test_listing_a_file_or_missing_directory_is_not_found(image):
+    image_path, geometry = image
+    fat = FAT16(image_path)
+    with pytest.raises(FileNotFoundError):
+        fat.list_dir('F0000000.BIN')
+    with pytest.raises(FileNotFoundError):
+        list(fat.scandir('SUB/NOPE'))
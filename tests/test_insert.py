@@ -0,0 +1,67 @@
+import io
+import pytest
+from fat16lib import FAT16, FileNotFoundError, InvalidFileNameError, NotEnoughSpaceError, build_image
+from fat16lib.constants import DIR_ENTRY_SIZE
+
+@pytest.fixture
+def image(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    geometry = build_image(path, 16 * 1024 * 1024, file_count=2, file_size=3000)
+    return path, geometry
+
+def test_insert_many_isolates_failing_sources(image, tmp_path):
+    image_path, geometry = image
+    source = tmp_path / 'GOOD.BIN'
+    source.write_bytes(b'good' * 1000)
+
+    with FAT16.open(image_path, writable=True) as fat:
+        results = fat.insert_many([
+            str(source),
+            str(tmp_path / 'MISSING.BIN'),
+            ('F0000000.BIN', io.BytesIO(b'duplicate')),
+            ('STREAM.BIN', iter([b'ab', b'cd'])),
+            ('BAD.BIN', 42),
+        ])
+
+    assert [result.name for result in results] == ['GOOD.BIN', 'MISSING.BIN', 'F0000000.BIN', 'STREAM.BIN', 'BAD.BIN']
+    assert results[0].error is None and results[0].size == 4000
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert isinstance(results[2].error, InvalidFileNameError)
+    assert results[3].error is None and results[3].size == 4
+    assert isinstance(results[4].error, TypeError)
+
+    with FAT16.open(image_path) as fat:
+        assert fat.read_file('GOOD.BIN') == 'good' * 1000
+        assert fat.read_file('STREAM.BIN') == 'abcd'
+        assert fat.check().clean
+
+def test_insert_many_reports_a_full_subdirectory_that_cannot_grow(image, make_directory):
+    image_path, geometry = image
+    slots = geometry.cluster_size // DIR_ENTRY_SIZE
+    make_directory(image_path, geometry, 2, 'SUB', geometry.total_clusters + 1, file_count=slots - 2)
+
+    with FAT16.open(image_path, writable=True) as fat:
+        free = fat.free_space()
+        results = fat.insert_many([('FILL.BIN', io.BytesIO(bytes(free))), ('SUB/NEW.BIN', io.BytesIO(b''))])
+
+        assert results[0].error is None
+        assert isinstance(results[1].error, NotEnoughSpaceError)
+        assert fat.check().clean
+
+    with FAT16.open(image_path) as fat:
+        assert 'NEW.BIN' not in dict(fat.list_dir('SUB'))
+        assert dict(fat.list_files())['FILL.BIN'] == free
+
+def test_insert_many_grows_a_full_subdirectory(image, make_directory):
+    image_path, geometry = image
+    slots = geometry.cluster_size // DIR_ENTRY_SIZE
+    make_directory(image_path, geometry, 2, 'SUB', geometry.total_clusters + 1, file_count=slots - 2)
+
+    with FAT16.open(image_path, writable=True) as fat:
+        results = fat.insert_many([('SUB/NEW.BIN', io.BytesIO(b'new'))])
+        assert results[0].error is None
+        assert fat.check().clean
+
+    with FAT16.open(image_path) as fat:
+        assert fat.read_file('SUB/NEW.BIN') == 'new'
+        assert len(fat.list_dir('SUB')) == slots - 1
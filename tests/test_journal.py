@@ -0,0 +1,102 @@
+import os
+import pytest
+from fat16lib import FAT16, FileAccessError, build_image
+from fat16lib.image import DiskImage
+from fat16lib.journal import journal_path
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    build_image(path, 16 * 1024 * 1024, file_count=4, file_size=(1000, 9000), fragmentation=0.5)
+    return path
+
+def _fail_writes(monkeypatch, should_fail):
+    """Make image writes fail with EIO whenever should_fail(call number) is true"""
+    write_disk = DiskImage._write_disk
+    calls = []
+
+    def failing(self, offset, data):
+        calls.append(offset)
+        if should_fail(len(calls)):
+            raise OSError(5, 'Input/output error')
+        return write_disk(self, offset, data)
+
+    monkeypatch.setattr(DiskImage, '_write_disk', failing)
+
+def test_exception_inside_transaction_rolls_everything_back(image_path):
+    with open(image_path, 'rb') as image:
+        before = image.read()
+
+    with FAT16.open(image_path, writable=True) as fat:
+        with pytest.raises(RuntimeError):
+            with fat.transaction():
+                fat.delete_file('F0000000.BIN')
+                fat.rename_file('F0000001.BIN', 'KEPT.BIN')
+                raise RuntimeError('abort')
+        assert [name for name, size in fat.list_files()][:2] == ['F0000000.BIN', 'F0000001.BIN']
+
+    with open(image_path, 'rb') as image:
+        assert image.read() == before
+    assert not os.path.exists(journal_path(image_path))
+
+def test_committed_journal_is_replayed_on_next_mount(image_path, monkeypatch):
+    fat = FAT16.open(image_path, writable=True)
+    _fail_writes(monkeypatch, lambda call: True)
+    with pytest.raises(FileAccessError):
+        with fat.transaction():
+            fat.delete_file('F0000000.BIN')
+            fat.delete_file('F0000001.BIN')
+    monkeypatch.undo()
+
+    # nothing reached the image, so the journal is all that survives, like after a crash
+    assert not fat.mounted
+    assert os.path.exists(journal_path(image_path))
+
+    with FAT16.open(image_path, writable=True) as fat:
+        assert [name for name, size in fat.list_files()] == ['F0000002.BIN', 'F0000003.BIN']
+        assert fat.check().clean
+    assert not os.path.exists(journal_path(image_path))
+
+def test_failed_apply_is_replayed_before_the_session_continues(image_path, monkeypatch):
+    with FAT16.open(image_path, writable=True) as fat:
+        _fail_writes(monkeypatch, lambda call: call == 2)
+        with pytest.raises(FileAccessError):
+            with fat.transaction():
+                fat.delete_file('F0000000.BIN')
+                fat.delete_file('F0000001.BIN')
+        assert not os.path.exists(journal_path(image_path))
+
+        with fat.transaction():
+            fat.rename_file('F0000002.BIN', 'RENAMED.BIN')
+        monkeypatch.undo()
+
+    with FAT16.open(image_path) as fat:
+        assert [name for name, size in fat.list_files()] == ['RENAMED.BIN', 'F0000003.BIN']
+        assert fat.check().clean
+
+def test_transaction_refuses_to_overwrite_a_pending_journal(image_path, monkeypatch):
+    fat = FAT16(image_path)
+    _fail_writes(monkeypatch, lambda call: True)
+    with pytest.raises(FileAccessError):
+        with fat.transaction():
+            fat.delete_file('F0000000.BIN')
+    monkeypatch.undo()
+    with open(journal_path(image_path), 'rb') as journal:
+        pending = journal.read()
+
+    with FAT16.open(image_path, writable=True) as fat:
+        # a journal that shows up under a live mount must be recovered, not overwritten
+        with open(journal_path(image_path), 'wb') as journal:
+            journal.write(pending)
+        with pytest.raises(FileAccessError):
+            with fat.transaction():
+                fat.delete_file('F0000001.BIN')
+        with open(journal_path(image_path), 'rb') as journal:
+            assert journal.read() == pending
+
+    with FAT16.open(image_path, writable=True) as fat:
+        assert [name for name, size in fat.list_files()] == ['F0000001.BIN', 'F0000002.BIN', 'F0000003.BIN']
+        with fat.transaction():
+            fat.delete_file('F0000001.BIN')
+        assert fat.check().clean
+    assert not os.path.exists(journal_path(image_path))
@@ -0,0 +1,41 @@
+import io
+import pytest
+from fat16lib import FAT16, FileNotFoundError, build_image
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    build_image(path, 16 * 1024 * 1024, file_count=3, file_size=(3000, 12000), fragmentation=0.5)
+    return path
+
+def test_reader_follows_a_fragmented_chain_and_seeks(image_path):
+    with FAT16.open(image_path) as fat:
+        content = fat.read_file('F0000001.BIN').encode('latin-1')
+        with fat.open_file('F0000001.BIN') as reader:
+            assert reader.readall() == content
+            reader.seek(-100, io.SEEK_END)
+            assert reader.read(1000) == content[-100:]
+            reader.seek(1000)
+            assert reader.read(600) == content[1000:1600]
+
+def test_unmounted_readers_are_independent(image_path):
+    fat = FAT16(image_path)
+    first = fat.open_file('F0000000.BIN')
+    second = fat.open_file('F0000001.BIN')
+    assert not fat.mounted
+
+    head = first.read(10)
+    first.close()
+    # the second reader still has its own handle, and the image is free for writes
+    assert len(second.read()) == dict(fat.list_files())['F0000001.BIN']
+    fat.write_file('NEW.TXT', io.BytesIO(b'while reading'))
+    second.close()
+
+    assert fat.read_file('F0000000.BIN').encode('latin-1')[:10] == head
+    assert fat.read_file('NEW.TXT') == 'while reading'
+
+def test_unmounted_open_of_a_missing_file_leaves_nothing_open(image_path):
+    fat = FAT16(image_path)
+    with pytest.raises(FileNotFoundError):
+        fat.open_file('NOPE.BIN')
+    assert not fat.mounted
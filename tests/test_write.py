@@ -0,0 +1,49 @@
+import io
+import pytest
+from fat16lib import FAT16, FileAccessError, FileNotFoundError, NotEnoughSpaceError, build_image
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = str(tmp_path / 'disk.img')
+    build_image(path, 16 * 1024 * 1024, file_count=2, file_size=2000)
+    return path
+
+def _failing_chunks(count, chunk):
+    for _ in range(count):
+        yield chunk
+    raise OSError(5, 'Input/output error')
+
+def test_sized_write_lands_in_one_extent(image_path):
+    with FAT16.open(image_path, writable=True) as fat:
+        written = fat.write_file('BIG.BIN', (bytes([index]) * 4096 for index in range(16)), size=65536)
+        assert written == 65536
+        assert fat.fragmentation() == 0.0
+        assert fat.read_file('BIG.BIN').encode('latin-1')[4096 * 15:] == b'\x0f' * 4096
+
+def test_unused_part_of_a_reservation_is_released(image_path):
+    with FAT16.open(image_path, writable=True) as fat:
+        free = fat.free_space()
+        assert fat.write_file('SHORT.BIN', io.BytesIO(b'x' * 1000), size=100000) == 1000
+        assert fat.free_space() == free - 1024
+        assert fat.check().clean
+
+def test_failed_source_releases_reservation_and_entry(image_path):
+    with FAT16.open(image_path, writable=True) as fat:
+        free = fat.free_space()
+        with pytest.raises(FileAccessError):
+            fat.write_file('BROKEN.BIN', _failing_chunks(3, b'y' * 4096), size=100000)
+        assert fat.free_space() == free
+        assert 'BROKEN.BIN' not in dict(fat.list_files())
+        assert fat.check().clean
+
+def test_reservation_larger_than_the_volume_fails_cleanly(image_path):
+    with FAT16.open(image_path, writable=True) as fat:
+        free = fat.free_space()
+        with pytest.raises(NotEnoughSpaceError):
+            fat.write_file('HUGE.BIN', io.BytesIO(b'z'), size=free + 1)
+        assert fat.free_space() == free
+        assert [name for name, size in fat.list_files()] == ['F0000000.BIN', 'F0000001.BIN']
+
+def test_write_from_a_missing_path_is_reported(image_path, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        FAT16(image_path).write_file('GONE.BIN', str(tmp_path / 'gone.bin'))